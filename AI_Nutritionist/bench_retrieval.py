@@ -0,0 +1,116 @@
+"""
+Parity check and micro-benchmark for meal-plan retrieval.
+
+Compares the previous selection with the current one:
+- Previous: per-request diet and budget masks, then sklearn cosine_similarity
+  over the raw embeddings, then _pick_best copying and masking the scores at
+  every relaxation step.
+- Current: MealRetriever with embeddings normalized once and one dot product,
+  then an argmax over PlanFilters' precomputed row subsets.
+
+Queries are meal embeddings with noise added,
+so most of them have a clear nearest plan, run under every diet x budget filter
+in the plan CSV. Run from the AI_Nutritionist directory:
+
+    python bench_retrieval.py --queries 100
+"""
+import argparse
+import itertools
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics.pairwise import cosine_similarity
+
+from meal_retrieval import MealRetriever, PlanFilters, _canon_budget, _canon_pref
+
+
+def reference_pick(q_emb, embeddings, df, diet, budget):
+    # get_meal_plan_for_calorie's selection before MealRetriever and PlanFilters
+    sims = cosine_similarity(q_emb, embeddings)[0]
+    n = len(df)
+    mask_diet = np.ones(n, dtype=bool)
+    mask_budget = np.ones(n, dtype=bool)
+    if diet and "Dietary Preference" in df.columns:
+        mask_diet = (df["Dietary Preference"].apply(_canon_pref) == _canon_pref(diet)).values
+    if budget and "Budget Preferences" in df.columns:
+        mask_budget = (df["Budget Preferences"].apply(_canon_budget) == _canon_budget(budget)).values
+    combined = mask_diet & mask_budget
+
+    def _pick_best(active_mask):
+        if not active_mask.any():
+            return None
+        s = sims.copy()
+        s[~active_mask] = -np.inf
+        idx = int(np.argmax(s))
+        return idx if np.isfinite(s[idx]) else None
+
+    best_idx = _pick_best(combined)
+    if best_idx is None and budget:
+        best_idx = _pick_best(mask_budget)
+    if best_idx is None and diet:
+        best_idx = _pick_best(mask_diet)
+    if best_idx is None:
+        best_idx = int(np.argmax(sims))
+    return best_idx, sims
+
+
+def retriever_pick(retriever, plan_filters, q_emb, diet, budget):
+    sims = retriever.scores(q_emb[0])
+    return retriever.best(sims, plan_filters.subsets(diet, budget))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--embeddings", default="meal_embeddings.npy")
+    parser.add_argument("--plans", default="meal_suggestion_meal_plans_2_clean_replaced.csv")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    embeddings = np.load(args.embeddings)
+    df = pd.read_csv(args.plans)
+    retriever = MealRetriever(embeddings)
+    plan_filters = PlanFilters(len(df), df["Dietary Preference"], df["Budget Preferences"])
+
+    rng = np.random.default_rng(args.seed)
+    rows = rng.integers(0, len(embeddings), args.queries)
+    queries = embeddings[rows] + rng.normal(0, args.noise, (args.queries, embeddings.shape[1])).astype(np.float32)
+
+    # Raw CSV values, user-style spellings and a value no row has
+    diets = [None, "Vegetarian", "non veg", "pescatarian"] + sorted(df["Dietary Preference"].dropna().unique())
+    budgets = [None, "Affordable", "premium", "unknown"] + sorted(df["Budget Preferences"].dropna().unique())
+    cases = list(itertools.product(diets, budgets))
+
+    mismatches = ties = 0
+    ref_time = new_time = 0.0
+    for q in queries:
+        q_emb = q[None, :]
+        for diet, budget in cases:
+            start = time.perf_counter()
+            expected, sims = reference_pick(q_emb, embeddings, df, diet, budget)
+            ref_time += time.perf_counter() - start
+            start = time.perf_counter()
+            got = retriever_pick(retriever, plan_filters, q_emb, diet, budget)
+            new_time += time.perf_counter() - start
+            if got != expected:
+                # Float32 rounding may reorder two rows whose cosines are equal to ~1e-6
+                if abs(float(sims[got]) - float(sims[expected])) <= 1e-6:
+                    ties += 1
+                else:
+                    mismatches += 1
+
+    total = len(queries) * len(cases)
+    print(f"{len(embeddings)} x {embeddings.shape[1]} embeddings, {total} selections "
+          f"({len(queries)} queries x {len(cases)} diet/budget filters)")
+    print(f"  masks + cosine_similarity + _pick_best: {ref_time / total * 1e6:8.1f} us per selection")
+    print(f"  MealRetriever + PlanFilters:            {new_time / total * 1e6:8.1f} us per selection "
+          f"({ref_time / new_time:.1f}x)")
+    print(f"  parity: {total - mismatches - ties} identical, {ties} float ties, {mismatches} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
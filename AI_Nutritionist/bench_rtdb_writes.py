@@ -0,0 +1,61 @@
+"""
+Request-path latency and durability of RTDB writes, offline.
+
+Runs against LocalRTDB with a simulated round trip (--latency, about the
+asia-southeast1 RTT from elsewhere) and a simulated failure rate. It compares
+a synchronous push() per request with WriteBehindWriter.push(), then flushes
+the writer and checks that every record arrived under the id returned to the
+caller. Run from the AI_Nutritionist directory:
+
+    python bench_rtdb_writes.py --requests 500 --latency 0.15 --fail-rate 0.2
+"""
+import argparse
+import sys
+import time
+
+from rtdb_writer import LocalRTDB, WriteBehindWriter
+
+
+def payload(i):
+    return {"ts_ms": int(time.time() * 1000), "n": i, "meals": {"breakfast": {"recipe": "Oats"}}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--fail-rate", type=float, default=0.2)
+    parser.add_argument("--sync-requests", type=int, default=20,
+                        help="synchronous pushes to time (each waits --latency)")
+    args = parser.parse_args()
+
+    sync_db = LocalRTDB(latency=args.latency)
+    start = time.perf_counter()
+    for i in range(args.sync_requests):
+        sync_db.child("meal_suggestions").push(payload(i))
+    sync_ms = (time.perf_counter() - start) / args.sync_requests * 1e3
+
+    db = LocalRTDB(latency=args.latency, fail_rate=args.fail_rate)
+    writer = WriteBehindWriter(db, backoff=0.05)
+    ids = []
+    start = time.perf_counter()
+    for i in range(args.requests):
+        ids.append(writer.push("meal_suggestions", payload(i)))
+    queued_ms = (time.perf_counter() - start) / args.requests * 1e3
+    start = time.perf_counter()
+    flushed = writer.close(timeout=120)
+    drain_s = time.perf_counter() - start
+
+    stored = db.child("meal_suggestions").get().val() or {}
+    missing = [fid for i, fid in enumerate(ids) if (stored.get(fid) or {}).get("n") != i]
+    stats = dict(writer.stats)
+    print(f"synchronous push:    {sync_ms:8.2f} ms per request")
+    print(f"write-behind push:   {queued_ms:8.3f} ms per request")
+    print(f"drained {args.requests} writes in {drain_s:.2f} s: {stats.get('batches', 0)} round trips, "
+          f"{stats.get('retries', 0)} retries, {stats.get('dead_lettered', 0)} dead-lettered")
+    print(f"durability: {args.requests - len(missing)}/{args.requests} records stored under their returned ids")
+    return 0 if flushed and not missing else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
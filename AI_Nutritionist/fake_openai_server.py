@@ -0,0 +1,148 @@
+"""
+Local stand-in for the OpenAI API, for testing GPT validation and ingredients offline.
+
+Answers POST /v1/responses and /v1/chat/completions with deterministic JSON:
+- Meal-plan validation (the dietitian prompt): one "moderate" warning per
+  listed condition, so GPT answers are easy to tell apart from the rules engine
+- Ingredient generation: a short ingredient list with alternatives for the dish
+
+--delay makes every reply slow, to exercise GPT_VALIDATION_DEADLINE and
+GPT_INGREDIENTS_DEADLINE. Point the API at it from the AI_Nutritionist directory:
+
+    python fake_openai_server.py --port 8099 --delay 3
+    OPENAI_API_KEY=test OPENAI_BASE_URL=http://127.0.0.1:8099/v1 GPT_VALIDATION_DEADLINE=1 uvicorn main:app
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _messages(body):
+    # Responses API sends `input`, Chat Completions sends `messages`
+    items = body.get("input") if isinstance(body.get("input"), list) else body.get("messages") or []
+    system = " ".join(str(m.get("content", "")) for m in items if m.get("role") == "system")
+    user = " ".join(str(m.get("content", "")) for m in items if m.get("role") == "user")
+    return system, user
+
+
+def _json_after(text, marker=""):
+    # The JSON object a prompt embeds (validation: after "Data: ", ingredients: the whole message)
+    if marker:
+        text = text.split(marker, 1)[-1]
+    try:
+        return json.loads(text)
+    except ValueError:
+        return {}
+
+
+def answer(body):
+    system, user = _messages(body)
+    if "dietitian" in system:
+        data = _json_after(user, "Data: ")
+        warnings = [{
+            "meal_type": "Lunch",
+            "disease": str(cond),
+            "severity": "moderate",
+            "reasons": [f"fake review for {cond}"],
+            "suggestions": ["Check portion sizes"],
+        } for cond in data.get("conditions", [])]
+        return {"is_safe": not warnings, "warnings": warnings}
+    dish = _json_after(user).get("dish", "dish")
+    return {
+        "recipe": dish,
+        "items": [
+            {"ingredient": "rice", "alternatives": ["quinoa", "couscous"]},
+            {"ingredient": "onion", "alternatives": ["shallot"]},
+            {"ingredient": "olive oil", "alternatives": ["canola oil", "sunflower oil"]},
+        ],
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    delay = 0.0
+    counts = {"requests": 0}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(400, {"error": {"message": "invalid JSON", "type": "invalid_request_error"}})
+        with self.lock:
+            self.counts["requests"] += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+        text = json.dumps(answer(body))
+        now = int(time.time())
+        model = body.get("model", "fake")
+        if self.path.rstrip("/").endswith("/responses"):
+            return self._send(200, {
+                "id": f"resp_fake_{now}",
+                "object": "response",
+                "created_at": now,
+                "model": model,
+                "status": "completed",
+                "output": [{
+                    "id": f"msg_fake_{now}",
+                    "type": "message",
+                    "role": "assistant",
+                    "status": "completed",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}],
+                }],
+                "parallel_tool_calls": False,
+                "tool_choice": "auto",
+                "tools": [],
+            })
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send(200, {
+                "id": f"chatcmpl-fake-{now}",
+                "object": "chat.completion",
+                "created": now,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+            })
+        self._send(404, {"error": {"message": f"unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def do_GET(self):
+        # Request count, to check how many calls reached "OpenAI" (e.g. after cache hits)
+        with self.lock:
+            self._send(200, dict(self.counts))
+
+    def _send(self, status, doc):
+        data = json.dumps(doc).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before every reply")
+    args = parser.parse_args()
+
+    Handler.delay = args.delay
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Fake OpenAI API on http://{args.host}:{args.port}/v1 (delay {args.delay}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,26 @@
 import logging
 from fastapi import FastAPI,HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import pandas as pd
 import joblib
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import pyrebase
 from typing import List, Dict, Optional
 from pydantic import BaseModel
 from requests.exceptions import HTTPError
-import os, json, time, re
+import os, json, time, re, threading
+from types import MappingProxyType
 from dotenv import load_dotenv
 load_dotenv()
 from openai import OpenAI
+import httpx
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 import datetime as _dt
+from meal_retrieval import MealRetriever, PlanFilters, _canon_budget, _canon_pref
+from rtdb_writer import InvalidPathError, LocalRTDB, WriteBehindWriter, WriteQueueFull
+from validation_cache import ValidationCache, validation_key
 # -----------------------------------
 
 app = FastAPI()
@@ -32,6 +38,23 @@ model = joblib.load("calorie_prediction_model.pkl")
 meal_embeddings = np.load("meal_embeddings.npy")
 df = pd.read_csv("meal_suggestion_meal_plans_2_clean_replaced.csv")
 meal_suggestion_model = SentenceTransformer("meal_suggestion_sentence_model")
+# Embeddings L2-normalized once; each query is then a single dot product
+meal_retriever = MealRetriever(meal_embeddings)
+# Diet/budget columns canonicalized once into row subsets for every filter combination
+plan_filters = PlanFilters(
+    len(df),
+    df["Dietary Preference"] if "Dietary Preference" in df.columns else None,
+    df["Budget Preferences"] if "Budget Preferences" in df.columns else None,
+)
+
+# Plan CSV columns returned for a suggestion, and the response key for each
+MEAL_KEYS = {
+    "breakfast": "Breakfast Suggestion",
+    "lunch": "Lunch Suggestion",
+    "dinner": "Dinner Suggestion",
+    "snack": "Snack Suggestion",
+}
+MEAL_COLUMNS = list(MEAL_KEYS.values())
 
 # Ingredient mapping from CSV
 
@@ -134,8 +157,47 @@ firebase_config = {
     "measurementId": "G-N6HTF73B3J"
 }
 
-firebase = pyrebase.initialize_app(firebase_config)
-db = firebase.database()
+# RTDB_BACKEND=local swaps in an in-process stand-in (no network) for offline testing
+RTDB_BACKEND = os.getenv("RTDB_BACKEND", "firebase")
+if RTDB_BACKEND == "local":
+    db = LocalRTDB(path=os.getenv("RTDB_LOCAL_FILE") or None,
+                   latency=float(os.getenv("RTDB_LOCAL_LATENCY", "0")),
+                   fail_rate=float(os.getenv("RTDB_LOCAL_FAIL_RATE", "0")))
+    _writer_db = db
+else:
+    firebase = pyrebase.initialize_app(firebase_config)
+    db = firebase.database()
+    # pyrebase keeps per-call path state on the Database object, so the writer thread gets its own
+    _writer_db = firebase.database()
+
+# Writes are applied in the background (coalesced multi-path updates with retries);
+# push ids are generated client-side so responses can include them immediately
+rtdb_writer = WriteBehindWriter(
+    _writer_db,
+    maxsize=int(os.getenv("RTDB_WRITE_QUEUE_SIZE", "10000")),
+    batch_max=int(os.getenv("RTDB_WRITE_BATCH", "500")),
+    retries=int(os.getenv("RTDB_WRITE_RETRIES", "5")),
+    put_timeout=float(os.getenv("RTDB_WRITE_PUT_TIMEOUT", "5")),
+    dead_letter_path=os.getenv("RTDB_DEAD_LETTER_FILE") or None,
+)
+# Reads of a collection wait this long for its queued writes to land (read-your-writes)
+RTDB_READ_WAIT = float(os.getenv("RTDB_READ_WAIT", "2"))
+
+# Writes are checked before they are queued, so a bad key fails its own request
+@app.exception_handler(InvalidPathError)
+def _invalid_rtdb_path(request, exc: InvalidPathError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+# Queue still full after RTDB_WRITE_PUT_TIMEOUT (e.g. during an RTDB outage): the write was not accepted
+@app.exception_handler(WriteQueueFull)
+def _rtdb_queue_full(request, exc: WriteQueueFull):
+    return JSONResponse(status_code=503, content={"detail": "Database writes are backed up; try again later"},
+                        headers={"Retry-After": "5"})
+
+@app.on_event("shutdown")
+def _flush_rtdb_writes():
+    if not rtdb_writer.close():
+        logging.error("Shutting down with %d RTDB writes still queued", rtdb_writer.pending())
 
 # -------------------- Schemas --------------------
 class IngredientAlt(BaseModel):
@@ -318,11 +380,11 @@ def validate_with_rules(plan: CustomMealPlanRequest, conditions: List[str]) -> V
     return ValidationResult(is_safe=is_safe, warnings=warnings)
 
 
-def get_meal_plan_for_calorie(
+def _meal_query(
     calorie_target: float,
     dietary_preference: str | None = None,
     budget_preference: str | None = None,
-):
+) -> str:
     # Build a semantically-informative query so the embedding also leans the right way
     query = f"A healthy meal plan for a person needing {calorie_target} calories"
 
@@ -339,51 +401,27 @@ def get_meal_plan_for_calorie(
             "medium": " that balances cost and quality",
             "high": " that uses premium ingredients",
         }.get(bp, f" that fits a {bp} budget")
+    return query
+
 
+def _best_plan_row(sims, dietary_preference: str | None, budget_preference: str | None) -> int:
+    # Strict (diet and budget), then relax stepwise budget-only -> diet-only;
+    # global best is the final fallback
+    subsets = plan_filters.subsets(dietary_preference, budget_preference)
+    return meal_retriever.best(sims, subsets)
+
+
+def get_meal_plan_for_calorie(
+    calorie_target: float,
+    dietary_preference: str | None = None,
+    budget_preference: str | None = None,
+):
+    query = _meal_query(calorie_target, dietary_preference, budget_preference)
     q_emb = meal_suggestion_model.encode([query])
-    sims = cosine_similarity(q_emb, meal_embeddings)[0]
-
-    # ------- Build masks -------
-    n = len(df)
-    mask_diet = np.ones(n, dtype=bool)
-    mask_budget = np.ones(n, dtype=bool)
-
-    # Dietary Preference mask (if column present)
-    if dietary_preference and "Dietary Preference" in df.columns:
-        pref_col = df["Dietary Preference"].apply(_canon_pref)
-        mask_diet = (pref_col == _canon_pref(dietary_preference)).values
-
-    # Budget Preference mask (if column present)
-    if budget_preference and "Budget Preferences" in df.columns:
-        bud_col = df["Budget Preferences"].apply(_canon_budget)
-        mask_budget = (bud_col == _canon_budget(budget_preference)).values
-
-    # Try strict: both masks
-    combined = mask_diet & mask_budget
-    sims_try = sims.copy()
-
-    def _pick_best(active_mask):
-        if not active_mask.any():
-            return None
-        s = sims.copy()
-        s[~active_mask] = -np.inf
-        idx = int(np.argmax(s))
-        return idx if np.isfinite(s[idx]) else None
-
-    best_idx = _pick_best(combined)
-
-    # If nothing matched, relax stepwise: budget-only -> diet-only -> global best
-    if best_idx is None and budget_preference:
-        best_idx = _pick_best(mask_budget)
-    if best_idx is None and dietary_preference:
-        best_idx = _pick_best(mask_diet)
-    if best_idx is None:
-        best_idx = int(np.argmax(sims))  # final fallback
-
-    return df.iloc[best_idx][[
-        "Breakfast Suggestion", "Lunch Suggestion",
-        "Dinner Suggestion", "Snack Suggestion"
-    ]]
+    sims = meal_retriever.scores(q_emb[0])
+    best_idx = _best_plan_row(sims, dietary_preference, budget_preference)
+
+    return df.iloc[best_idx][MEAL_COLUMNS]
 
 
 def fetch_ingredients_for_recipe(recipe_name: str) -> list[str]:
@@ -392,17 +430,14 @@ def fetch_ingredients_for_recipe(recipe_name: str) -> list[str]:
     name = str(recipe_name).strip()
 
     # First try CSV (case-insensitive)
-    subset = ingredient_df[ingredient_df['Recipe'].str.lower() == name.lower()]
-    if not subset.empty:
-        return subset['Ingredient'].dropna().astype(str).str.strip().tolist()
+    entry = ingredient_index.get(_recipe_key(name))
+    if entry is not None:
+        return list(entry.ingredients)
 
-    # Fallback to hardcoded map (case-sensitive key; try exact, then case-insensitive scan)
+    # Fallback to hardcoded map (case-sensitive key; try exact, then case-insensitive)
     if name in RECIPE_FALLBACK_MAP:
         return RECIPE_FALLBACK_MAP[name]
-    for k, v in RECIPE_FALLBACK_MAP.items():
-        if k.lower() == name.lower():
-            return v
-    return []
+    return _FALLBACK_BY_LOWER.get(name.lower(), [])
 
 
 def fetch_alternatives_for_recipe(recipe_name: str) -> list[dict]:
@@ -414,40 +449,62 @@ def fetch_alternatives_for_recipe(recipe_name: str) -> list[dict]:
     ]
     using Alternative_1..3 columns if present.
     """
-    results = []
     if not recipe_name:
-        return results
-
-    name = str(recipe_name).strip().lower()
-    subset = ingredient_df[ingredient_df['Recipe'].str.lower() == name]
-    if subset.empty:
-        return results
-
-    alt_cols = [c for c in ['Alternative_1', 'Alternative_2', 'Alternative_3'] if c in subset.columns]
-    for _, row in subset.iterrows():
-        alts = []
-        for c in alt_cols:
-            v = row.get(c, None)
-            if pd.notna(v) and str(v).strip():
-                alts.append(str(v).strip())
-        results.append({
-            "ingredient": str(row['Ingredient']).strip(),
-            "alternatives": alts
-        })
-    return results
+        return []
+    entry = ingredient_index.get(_recipe_key(recipe_name))
+    if entry is None:
+        return []
+    return _copy_items(entry.alternatives)
 
 
 # optional GPT validation
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 
+# Seconds a request waits for GPT before falling back (rules / no ingredients)
+GPT_VALIDATION_DEADLINE = float(os.getenv("GPT_VALIDATION_DEADLINE", "8"))
+GPT_INGREDIENTS_DEADLINE = float(os.getenv("GPT_INGREDIENTS_DEADLINE", "15"))
+
+# One client (and one httpx connection pool) shared by every GPT call.
+# OPENAI_BASE_URL points it at another endpoint, e.g. fake_openai_server.py in tests.
+# Each call's HTTP timeout is its endpoint's deadline, and retries are off by default,
+# so a slow upstream holds a pool thread for about one deadline, not several.
+GPT_WORKERS = int(os.getenv("GPT_WORKERS", "16"))
+openai_client = OpenAI(
+    api_key=OPENAI_KEY,
+    base_url=os.getenv("OPENAI_BASE_URL") or None,
+    timeout=float(os.getenv("OPENAI_TIMEOUT", str(max(GPT_VALIDATION_DEADLINE, GPT_INGREDIENTS_DEADLINE)))),
+    max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "0")),
+    http_client=httpx.Client(limits=httpx.Limits(max_connections=GPT_WORKERS,
+                                                 max_keepalive_connections=GPT_WORKERS)),
+) if OPENAI_KEY else None
+# GPT calls run here so requests can stop waiting at their deadline
+_gpt_pool = ThreadPoolExecutor(max_workers=GPT_WORKERS, thread_name_prefix="gpt")
+
 SAVE_GPT_ING_TO_CSV = os.getenv("SAVE_GPT_ING_TO_CSV", "1") not in {"0", "false", "False", ""}
 
+# GPT verdicts keyed by plan content + conditions + model (memory LRU, optional shared disk tier)
+validation_cache = ValidationCache(
+    maxsize=int(os.getenv("GPT_VALIDATION_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("GPT_VALIDATION_CACHE_TTL", str(7 * 24 * 3600))),
+    directory=os.getenv("GPT_VALIDATION_CACHE_DIR") or None,
+)
+
 def validate_with_gpt(plan: CustomMealPlanRequest, conditions: List[str]) -> Optional[ValidationResult]:
-    if not OPENAI_KEY:
+    """
+    GPT verdict for the plan, or None when GPT is unavailable or fails.
+    - Identical plans (same content, conditions and model) are answered from validation_cache
+    - Only successful GPT results are cached, so failures are retried next time
+    """
+    if openai_client is None:
         return None
+    model = os.getenv("MEAL_RISK_MODEL", "gpt-4o-mini")
+    plan_data = json.loads(CustomMealPlanRequest.model_dump_json(plan))
+    cache_key = validation_key(plan_data, conditions, model)
+    cached = validation_cache.get(cache_key)
+    if cached is not None:
+        return ValidationResult(**cached)
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_KEY)
+        client = openai_client.with_options(timeout=GPT_VALIDATION_DEADLINE)
 
         schema = {
             "name": "MealPlanValidation",
@@ -477,9 +534,8 @@ def validate_with_gpt(plan: CustomMealPlanRequest, conditions: List[str]) -> Opt
 
         user_payload = {
             "conditions": conditions,
-            "plan": json.loads(CustomMealPlanRequest.model_dump_json(plan))
+            "plan": plan_data
         }
-        print(user_payload)
 
         system_msg = "You are a licensed dietitian. Evaluate meal plans by meal for listed conditions. Return only JSON per schema."
         user_msg = f"Schema: {json.dumps(schema['schema'])}\nData: {json.dumps(user_payload, ensure_ascii=False)}"
@@ -487,7 +543,7 @@ def validate_with_gpt(plan: CustomMealPlanRequest, conditions: List[str]) -> Opt
         # 1) Try Responses API + structured outputs (new SDKs)
         try:
             resp = client.responses.create(
-                model=os.getenv("MEAL_RISK_MODEL", "gpt-4o-mini"),
+                model=model,
                 input=[{"role": "system", "content": system_msg},
                        {"role": "user", "content": user_msg}],
                 response_format={"type": "json_schema", "json_schema": schema},
@@ -502,7 +558,7 @@ def validate_with_gpt(plan: CustomMealPlanRequest, conditions: List[str]) -> Opt
         # 2) Fallback: Chat Completions JSON mode (older SDKs don’t support response_format in Responses)
         except TypeError:
             chat = client.chat.completions.create(
-                model=os.getenv("MEAL_RISK_MODEL", "gpt-4o-mini"),
+                model=model,
                 response_format={"type": "json_object"},
                 messages=[
                     {"role": "system", "content": system_msg},
@@ -512,12 +568,33 @@ def validate_with_gpt(plan: CustomMealPlanRequest, conditions: List[str]) -> Opt
             data = json.loads(chat.choices[0].message.content)
 
         warnings = [ValidationWarning(**w) for w in data.get("warnings", [])]
-        return ValidationResult(is_safe=bool(data.get("is_safe", True)), warnings=warnings)
+        result = ValidationResult(is_safe=bool(data.get("is_safe", True)), warnings=warnings)
+        validation_cache.put(cache_key, result.model_dump())
+        return result
 
     except Exception as e:
-        print(f"GPT validation failed: {e}")
+        logging.warning("GPT validation failed: %s", e)
         return None
 
+def validate_plan(plan: CustomMealPlanRequest, conditions: List[str]) -> ValidationResult:
+    """
+    GPT verdict if it arrives within GPT_VALIDATION_DEADLINE seconds, else the rules verdict.
+    - validate_with_rules runs while the GPT call is in flight, so a slow upstream costs at most the deadline
+    - A GPT answer that arrives late still lands in validation_cache for the next identical plan
+    """
+    start = time.monotonic()
+    future = _gpt_pool.submit(validate_with_gpt, plan, conditions) if openai_client is not None else None
+    rules = validate_with_rules(plan, conditions)
+    if future is None:
+        return rules
+    try:
+        gpt = future.result(timeout=max(0.0, GPT_VALIDATION_DEADLINE - (time.monotonic() - start)))
+    except FutureTimeout:
+        future.cancel()  # only succeeds if the pool had not started it yet
+        logging.warning("GPT validation missed its %.1fs deadline; using rules", GPT_VALIDATION_DEADLINE)
+        return rules
+    return gpt or rules
+
 def _today_str():
     return _dt.date.today().isoformat()
 
@@ -525,16 +602,6 @@ def _today_str():
 def _ratings_path(date_str: str) -> str:
     return f"ratings/{date_str}"
 
-def _canon_pref(x: str) -> str:
-    if not isinstance(x, str):
-        return ""
-    s = x.strip().lower()
-    # map common variants
-    if s in {"veg", "vegetarian"}: return "veg"
-    if s in {"non-veg", "non veg", "nonvegetarian", "non vegetarian", "omnivore"}: return "non-veg"
-    if s in {"vegan"}: return "vegan"
-    return s
-
 def _norm(s: str) -> str:
     return (s or "").strip()
 
@@ -560,12 +627,68 @@ def _clean_alt_list(ingredient: str, alts: List[str]) -> List[str]:
     return cleaned[:3]
 
 
+# -------------------- Ingredient index --------------------
+def _recipe_key(name: str) -> str:
+    return str(name).strip().lower()
+
+def _copy_items(items: List[Dict]) -> List[Dict]:
+    # Callers get their own lists; the index entries are shared between requests
+    return [{"ingredient": it["ingredient"], "alternatives": list(it["alternatives"])} for it in items]
+
+class _RecipeEntry:
+    """
+    Pre-built lookups for one recipe from its ingredient rows (CSV order):
+    - ingredients: the flat ingredient list
+    - alternatives: Alternative_1..3 as stored (non-empty values)
+    - with_alts: alternatives cleaned by _clean_alt_list
+    """
+    __slots__ = ("rows", "ingredients", "alternatives", "with_alts")
+
+    def __init__(self, rows):
+        self.rows = tuple(rows)  # (Ingredient, Alternative_1, Alternative_2, Alternative_3)
+        self.ingredients = [str(ing).strip() for ing, *_ in self.rows]
+        self.alternatives = [
+            {"ingredient": str(ing).strip(),
+             "alternatives": [str(a).strip() for a in alts if pd.notna(a) and str(a).strip()]}
+            for ing, *alts in self.rows
+        ]
+        self.with_alts = []
+        for ing, *alts in self.rows:
+            ing = _norm(ing)
+            self.with_alts.append({"ingredient": ing, "alternatives": _clean_alt_list(ing, [_norm(a) for a in alts])})
+
+def _build_ingredient_index(frame: pd.DataFrame) -> Dict[str, _RecipeEntry]:
+    rows: Dict[str, list] = {}
+    for recipe, *values in frame[_EXPECTED_COLS].itertuples(index=False, name=None):
+        rows.setdefault(_recipe_key(recipe), []).append(tuple(values))
+    return {key: _RecipeEntry(r) for key, r in rows.items()}
+
+# Normalized recipe name -> _RecipeEntry. Replaced wholesale (copy-on-write) when
+# rows are added, so readers always see a complete catalog without locking.
+ingredient_index = MappingProxyType(_build_ingredient_index(ingredient_df))
+_ingredient_index_lock = threading.Lock()
+
+def _add_ingredient_rows(recipe_name: str, rows: List[tuple]) -> None:
+    # Rebuilds only this recipe's entry; concurrent writers are serialized
+    global ingredient_index
+    key = _recipe_key(recipe_name)
+    with _ingredient_index_lock:
+        updated = dict(ingredient_index)
+        old = updated.get(key)
+        updated[key] = _RecipeEntry((old.rows if old else ()) + tuple(rows))
+        ingredient_index = MappingProxyType(updated)
+
+# First key wins, like the old case-insensitive scan in insertion order
+_FALLBACK_BY_LOWER: Dict[str, List[str]] = {}
+for _name, _items in RECIPE_FALLBACK_MAP.items():
+    _FALLBACK_BY_LOWER.setdefault(_name.lower(), _items)
+
+
 def _gpt_ingredients(recipe_name: str) -> Optional[List[Dict[str, List[str]]]]:
-    if not OPENAI_KEY:
+    if openai_client is None:
         return None
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_KEY)
+        client = openai_client.with_options(timeout=GPT_INGREDIENTS_DEADLINE)
 
         system_msg = (
             "You are a culinary assistant. For the given dish name, return a canonical ingredient "
@@ -644,37 +767,48 @@ def _gpt_ingredients(recipe_name: str) -> Optional[List[Dict[str, List[str]]]]:
         logging.warning(f"GPT ingredient generation failed for {recipe_name!r}: {e}")
         return None
 
-# Ensure you have this global loaded once (you already do above in your file)
-# ingredient_df = pd.read_csv("all_recipe_ingredients.csv")
-
 def get_ingredients_with_alts(recipe_name: str) -> Optional[List[Dict[str, List[str]]]]:
-    global ingredient_df  # 👈 declare once at the very top
-    rnorm = recipe_name.strip().lower()
-
     # 1) CSV lookup (case-insensitive)
+    entry = ingredient_index.get(_recipe_key(recipe_name))
+    if entry is not None and entry.with_alts:
+        return _copy_items(entry.with_alts)
+
+    # 2) GPT fallback, bounded by GPT_INGREDIENTS_DEADLINE. A late answer is still
+    #    persisted by the pool thread, so the next request finds it in the index.
+    #    Requests for a recipe already being generated wait on the same job.
+    if openai_client is None:
+        return None
+    key = _recipe_key(recipe_name)
+    with _gpt_ingredient_jobs_lock:
+        future = _gpt_ingredient_jobs.get(key)
+        if future is None:
+            future = _gpt_pool.submit(_learn_gpt_ingredients, recipe_name)
+            _gpt_ingredient_jobs[key] = future
+            future.add_done_callback(lambda f, key=key: _forget_gpt_ingredient_job(key, f))
     try:
-        rows = ingredient_df[ingredient_df["Recipe"].str.lower() == rnorm]
-        if not rows.empty:
-            out = []
-            for _, row in rows.iterrows():
-                ing = _norm(row.get("Ingredient", ""))
-                a1 = _norm(row.get("Alternative_1", ""))
-                a2 = _norm(row.get("Alternative_2", ""))
-                a3 = _norm(row.get("Alternative_3", ""))
-                alts = _clean_alt_list(ing, [a1, a2, a3])
-                out.append({"ingredient": ing, "alternatives": alts})
-            if out:
-                return out
-    except Exception as e:
-        logging.warning(f"CSV ingredient lookup failed: {e}")
+        return future.result(timeout=GPT_INGREDIENTS_DEADLINE)
+    except FutureTimeout:
+        logging.warning(f"GPT ingredients for {recipe_name!r} missed the {GPT_INGREDIENTS_DEADLINE:.1f}s deadline")
+        return None
+
+# Recipe key -> in-flight GPT ingredient job, so retries share one call and one write
+_gpt_ingredient_jobs: Dict[str, Future] = {}
+_gpt_ingredient_jobs_lock = threading.Lock()
+
+def _forget_gpt_ingredient_job(key: str, future: Future) -> None:
+    with _gpt_ingredient_jobs_lock:
+        if _gpt_ingredient_jobs.get(key) is future:
+            del _gpt_ingredient_jobs[key]
 
-    # 2) GPT fallback
+def _learn_gpt_ingredients(recipe_name: str) -> Optional[List[Dict[str, List[str]]]]:
     gpt_items = _gpt_ingredients(recipe_name)
     if not gpt_items:
         return None
 
-    # 3) Optionally persist GPT result to CSV and refresh in-memory df
-    if SAVE_GPT_ING_TO_CSV:
+    # 3) Optionally persist GPT result to CSV and add it to the in-memory index,
+    #    unless the recipe got rows meanwhile (appending would duplicate its list)
+    existing = ingredient_index.get(_recipe_key(recipe_name))
+    if SAVE_GPT_ING_TO_CSV and not (existing and existing.rows):
         try:
             new_rows = []
             for it in gpt_items:
@@ -696,24 +830,13 @@ def get_ingredients_with_alts(recipe_name: str) -> Optional[List[Dict[str, List[
             header_needed = not os.path.exists(INGREDIENTS_CSV_PATH) or os.path.getsize(INGREDIENTS_CSV_PATH) == 0
             df_new.to_csv(INGREDIENTS_CSV_PATH, mode="a", header=header_needed, index=False)
 
-            # Refresh in-memory dataframe (fast: concat vs re-read disk)
-            ingredient_df = pd.concat([ingredient_df, df_new], ignore_index=True)
+            # Refresh the in-memory index (only this recipe's entry is rebuilt)
+            _add_ingredient_rows(recipe_name, [tuple(r[c] for c in _EXPECTED_COLS[1:]) for r in new_rows])
         except Exception as e:
             logging.warning(f"Failed to persist GPT ingredients: {e}")
 
     return gpt_items
 
-def _canon_budget(x: str) -> str:
-    s = str(x or "").strip().lower()
-    s = s.replace("-", " ").replace("_", " ")
-    if s in {"low", "budget", "affordable", "economical", "cheap", "thrifty"}:
-        return "low"
-    if s in {"medium", "moderate", "standard", "mid", "mid range", "midrange", "average", "avg"}:
-        return "medium"
-    if s in {"high", "premium", "luxury", "expensive", "gourmet", "costly"}:
-        return "high"
-    return s
-
 # -------------------- Public Endpoints --------------------
 @app.post("/ratings/set")
 def set_rating(req: RatingSetRequest):
@@ -726,11 +849,12 @@ def set_rating(req: RatingSetRequest):
         "ts_ms": int(_dt.datetime.utcnow().timestamp() * 1000),
     }
     # ratings/{YYYY-MM-DD}/{Breakfast|Lunch|Dinner|Snack}
-    db.child(_ratings_path(date_str)).child(req.meal_type).set(node)
+    rtdb_writer.set(f"{_ratings_path(date_str)}/{req.meal_type}", node)
     return {"status": "ok", "date": date_str}
 
 @app.get("/ratings/{date_str}")
 def get_ratings(date_str: str):
+    rtdb_writer.wait_idle("ratings", RTDB_READ_WAIT)
     snap = db.child(_ratings_path(date_str)).get()
     raw = snap.val() or {}
     # Return compact map { "Breakfast": 4.5, ... }
@@ -745,12 +869,12 @@ def get_ratings(date_str: str):
 @app.post("/validate-meal-plan", response_model=ValidationResult)
 def validate_meal_plan(req: ValidationRequest):
     conds = _conditions_from_profile(req.plan.profile, req.conditions)
-    # Try GPT first, then heuristics
-    gpt_result = validate_with_gpt(req.plan, conds)
-    if gpt_result:
-        return gpt_result
-    return validate_with_rules(req.plan, conds)
+    # GPT within its deadline, else heuristics
+    return validate_plan(req.plan, conds)
 
+@app.get("/validation-cache/stats")
+def validation_cache_stats():
+    return validation_cache.stats()
 
 
 @app.post("/custom-preference")
@@ -765,8 +889,8 @@ def save_custom_preference(pref: CustomPreference):
         "profile": pref.profile or {},
     }
     # you can also scope by user id: db.child(f"users/{uid}/custom_preferences").push(payload)
-    res = db.child("custom_preferences").push(payload)
-    return {"status": "ok", "id": res.get("name")}
+    pref_id = rtdb_writer.push("custom_preferences", payload)
+    return {"status": "ok", "id": pref_id}
 
 @app.post("/get-ingredients")
 def get_ingredients_endpoint(data: RecipeRequest):
@@ -795,7 +919,7 @@ def get_recipe_alternatives_endpoint(data: RecipeRequest):
 def save_custom_meal_plan(plan: CustomMealPlanRequest):
     # validate
     conds = _conditions_from_profile(plan.profile, None)
-    validation = validate_with_gpt(plan, conds) or validate_with_rules(plan, conds)
+    validation = validate_plan(plan, conds)
 
     payload = {
         "ts_ms": int(time.time() * 1000),
@@ -810,12 +934,13 @@ def save_custom_meal_plan(plan: CustomMealPlanRequest):
         },
         "validation": validation.model_dump(),
     }
-    res = db.child("custom_meal_plans").push(payload)  # or users/{uid}/custom_meal_plans
-    return CustomMealPlanSaveResponse(status="ok", id=res.get("name"))
+    plan_id = rtdb_writer.push("custom_meal_plans", payload)  # or users/{uid}/custom_meal_plans
+    return CustomMealPlanSaveResponse(status="ok", id=plan_id)
 
 @app.get("/custom-meal-plan/latest")
 def get_latest_custom_meal_plan():
     # fetch last by ts_ms
+    rtdb_writer.wait_idle("custom_meal_plans", RTDB_READ_WAIT)
     snap = db.child("custom_meal_plans").order_by_child("ts_ms").limit_to_last(1).get()
     if not snap.each():
         return {}
@@ -827,6 +952,7 @@ def get_latest_custom_meal_plan():
 @app.get("/custom-meal-plans")
 def list_custom_meal_plans(limit: int = 20):
     items = []
+    rtdb_writer.wait_idle("custom_meal_plans", RTDB_READ_WAIT)
     try:
         # Preferred: indexed query
         snap = db.child("custom_meal_plans").order_by_child("ts_ms").limit_to_last(limit).get()
@@ -848,6 +974,7 @@ def list_custom_meal_plans(limit: int = 20):
 
 @app.get("/custom-meal-plan/{plan_id}")
 def get_custom_meal_plan(plan_id: str):
+    rtdb_writer.wait_idle("custom_meal_plans", RTDB_READ_WAIT)
     data = db.child("custom_meal_plans").child(plan_id).get().val()
     if not data:
         raise HTTPException(status_code=404, detail="Custom meal plan not found")
@@ -856,18 +983,19 @@ def get_custom_meal_plan(plan_id: str):
 
 @app.delete("/custom-meal-plan/{plan_id}")
 def delete_custom_meal_plan(plan_id: str):
-    db.child("custom_meal_plans").child(plan_id).remove()
+    rtdb_writer.remove(f"custom_meal_plans/{plan_id}")
     return {"status": "ok"}
 
 @app.put("/custom-meal-plan/{plan_id}", response_model=CustomMealPlanSaveResponse)
 def update_custom_meal_plan(plan_id: str, plan: CustomMealPlanRequest):
     # load existing
+    rtdb_writer.wait_idle("custom_meal_plans", RTDB_READ_WAIT)
     old = db.child("custom_meal_plans").child(plan_id).get().val()
     if not old:
         raise HTTPException(status_code=404, detail="Custom meal plan not found")
 
     conds = _conditions_from_profile(plan.profile or old.get("profile"), None)
-    validation = validate_with_gpt(plan, conds) or validate_with_rules(plan, conds)
+    validation = validate_plan(plan, conds)
 
     # merge old + new (partial updates allowed)
     old_meals = old.get("meals", {})
@@ -886,13 +1014,11 @@ def update_custom_meal_plan(plan_id: str, plan: CustomMealPlanRequest):
         "validation": validation.model_dump(),
     }
 
-    db.child("custom_meal_plans").child(plan_id).set(payload)
+    rtdb_writer.set(f"custom_meal_plans/{plan_id}", payload)
     return CustomMealPlanSaveResponse(status="ok", id=plan_id)
 
-@app.post("/suggest-meal")
-def suggest_meal(user: UserProfile):
-    # Build model input
-    userData = pd.DataFrame([{
+def _model_row(user: UserProfile) -> dict:
+    return {
         'Age': user.Age,
         'Gender': user.Gender,
         'Height': user.Height,
@@ -907,58 +1033,35 @@ def suggest_meal(user: UserProfile):
         'Kidney Disease': user.Kidney_Disease,
         'Weight Gain': user.Weight_Gain,
         'Weight Loss': user.Weight_Loss
-    }])
-
-    # Predict calories
-    predicted_calories = float(model.predict(userData)[0])
-
-    # Get best meal plan (Series of 4 items)
-    suggestions_series = get_meal_plan_for_calorie(predicted_calories,
-        dietary_preference=user.Dietary_Preference ,budget_preference=user.Budget_Preferences)
-
-    # Normalize keys & look up ingredients + alternatives for each suggestion
-    # Keys in your CSV: 'Breakfast Suggestion', etc.
-    mapping = {
-        "breakfast": 'Breakfast Suggestion',
-        "lunch": 'Lunch Suggestion',
-        "dinner": 'Dinner Suggestion',
-        "snack": 'Snack Suggestion'
     }
 
+def _meals_block(suggestions, resolved: Optional[Dict[str, tuple]] = None) -> dict:
+    # suggestions: the four "<Meal> Suggestion" values of a plan row. `resolved` maps
+    # recipe -> (ingredients, alternatives) when the caller looked them up already.
     meals_block = {}
-    for key, csv_col in mapping.items():
-        recipe = str(suggestions_series[csv_col]).strip()
-        ingredients = fetch_ingredients_for_recipe(recipe)
-        alternatives = fetch_alternatives_for_recipe(recipe)
+    for key, csv_col in MEAL_KEYS.items():
+        recipe = str(suggestions[csv_col]).strip()
+        if resolved is not None and recipe in resolved:
+            ingredients, alternatives = resolved[recipe]
+        else:
+            ingredients = fetch_ingredients_for_recipe(recipe)
+            alternatives = fetch_alternatives_for_recipe(recipe)
         meals_block[key] = {
             "recipe": recipe,
             "ingredients": ingredients,              # flat list
             "ingredients_with_alternatives": alternatives  # per-ingredient alternatives
         }
+    return meals_block
 
-    # ---------- Save to Firebase Realtime Database ----------
-    payload = {
+def _suggestion_payload(user: UserProfile, predicted_calories: float, meals_block: dict) -> dict:
+    return {
         "ts_ms": int(time.time() * 1000),
         "predicted_calories": predicted_calories,
         "profile": user.dict(),
         "meals": meals_block
     }
 
-    # Example path: /meal_suggestions/<auto_id>
-    # If you want per-user paths, change to f"users/{USER_ID}/meal_suggestions"
-    push_result = db.child("meal_suggestions").push(payload)
-    firebase_id = push_result.get("name")  # auto-id from RTDB
-
-    # Return original API result + firebase id
-    xs =  {
-        "predicted_calories": predicted_calories,
-        "suggested_meals": {k: v["recipe"] for k, v in meals_block.items()},
-        "ingredients": {k: v["ingredients"] for k, v in meals_block.items()},
-        "ingredients_with_alternatives": {k: v["ingredients_with_alternatives"] for k, v in meals_block.items()},
-        "firebase_id": firebase_id
-    }
-
-    print(xs)
+def _suggestion_response(predicted_calories: float, meals_block: dict, firebase_id: Optional[str]) -> dict:
     return {
         "predicted_calories": predicted_calories,
         "suggested_meals": {k: v["recipe"] for k, v in meals_block.items()},
@@ -967,6 +1070,65 @@ def suggest_meal(user: UserProfile):
         "firebase_id": firebase_id
     }
 
+@app.post("/suggest-meal")
+def suggest_meal(user: UserProfile):
+    # Build model input
+    userData = pd.DataFrame([_model_row(user)])
+
+    # Predict calories
+    predicted_calories = float(model.predict(userData)[0])
+
+    # Get best meal plan (Series of 4 items)
+    suggestions_series = get_meal_plan_for_calorie(predicted_calories,
+        dietary_preference=user.Dietary_Preference ,budget_preference=user.Budget_Preferences)
+
+    # Look up ingredients + alternatives for each suggestion
+    meals_block = _meals_block(suggestions_series)
+
+    # ---------- Save to Firebase Realtime Database ----------
+    payload = _suggestion_payload(user, predicted_calories, meals_block)
+
+    # Example path: /meal_suggestions/<auto_id>
+    # If you want per-user paths, change to f"users/{USER_ID}/meal_suggestions"
+    firebase_id = rtdb_writer.push("meal_suggestions", payload)  # client-generated push id
+
+    # Return original API result + firebase id
+    return _suggestion_response(predicted_calories, meals_block, firebase_id)
+
+@app.post("/suggest-meal/batch")
+def suggest_meal_batch(users: List[UserProfile]):
+    """
+    /suggest-meal for many profiles at once; results[i] matches a /suggest-meal
+    call with users[i]:
+    - one model.predict over all profiles
+    - one encode() over the distinct query strings, scored against
+      meal_embeddings in one matrix product
+    - each distinct recipe's ingredients resolved once
+    - RTDB writes queued together, so the writer sends them as one multi-path update
+    """
+    if not users:
+        return {"results": []}
+
+    predicted = [float(c) for c in model.predict(pd.DataFrame([_model_row(u) for u in users]))]
+
+    queries = [_meal_query(c, u.Dietary_Preference, u.Budget_Preferences) for c, u in zip(predicted, users)]
+    distinct = list(dict.fromkeys(queries))
+    sims = meal_retriever.scores_many(meal_suggestion_model.encode(distinct))
+    query_row = {q: i for i, q in enumerate(distinct)}
+    rows = [_best_plan_row(sims[query_row[q]], u.Dietary_Preference, u.Budget_Preferences)
+            for q, u in zip(queries, users)]
+    plans = df.iloc[rows][MEAL_COLUMNS].to_dict("records")
+
+    recipes = {str(plan[col]).strip() for plan in plans for col in MEAL_COLUMNS}
+    resolved = {r: (fetch_ingredients_for_recipe(r), fetch_alternatives_for_recipe(r)) for r in recipes}
+    blocks = [_meals_block(plan, resolved) for plan in plans]
+
+    # ---------- Save to Firebase Realtime Database (queued, coalesced into one update) ----------
+    ids = [rtdb_writer.push("meal_suggestions", _suggestion_payload(u, c, block))
+           for u, c, block in zip(users, predicted, blocks)]
+
+    return {"results": [_suggestion_response(c, block, fid) for c, block, fid in zip(predicted, blocks, ids)]}
+
 @app.get("/")
 def read_root():
     return {"message": "Hello from FastAPI in Docker!"}
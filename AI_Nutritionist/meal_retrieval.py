@@ -0,0 +1,126 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+
+def _canon_pref(x: str) -> str:
+    if not isinstance(x, str):
+        return ""
+    s = x.strip().lower()
+    # map common variants
+    if s in {"veg", "vegetarian"}: return "veg"
+    if s in {"non-veg", "non veg", "nonvegetarian", "non vegetarian", "omnivore"}: return "non-veg"
+    if s in {"vegan"}: return "vegan"
+    return s
+
+
+def _canon_budget(x: str) -> str:
+    s = str(x or "").strip().lower()
+    s = s.replace("-", " ").replace("_", " ")
+    if s in {"low", "budget", "affordable", "economical", "cheap", "thrifty"}:
+        return "low"
+    if s in {"medium", "moderate", "standard", "mid", "mid range", "midrange", "average", "avg"}:
+        return "medium"
+    if s in {"high", "premium", "luxury", "expensive", "gourmet", "costly"}:
+        return "high"
+    return s
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize each row as float32, like sklearn's normalize():
+    all-zero rows are left as zeros instead of becoming NaN.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class MealRetriever:
+    """
+    Cosine-similarity search over the meal-plan embeddings.
+
+    The embeddings are normalized once at load, so scoring a query is a single
+    matrix-vector product (the same values cosine_similarity returns).
+    """
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = normalize_rows(embeddings)
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def scores(self, query_embedding: np.ndarray) -> np.ndarray:
+        # query_embedding: [dim] or [1, dim] -> [n_meals] cosine similarities
+        q = normalize_rows(np.asarray(query_embedding).reshape(1, -1))[0]
+        return self.embeddings @ q
+
+    def scores_many(self, query_embeddings: np.ndarray) -> np.ndarray:
+        # [n_queries, dim] -> [n_queries, n_meals] in one matrix product
+        q = normalize_rows(np.asarray(query_embeddings).reshape(len(query_embeddings), -1))
+        return q @ self.embeddings.T
+
+    @staticmethod
+    def best(scores: np.ndarray, subsets: Iterable[Optional[np.ndarray]] = ()) -> int:
+        """
+        Row with the highest score in the first non-empty subset (ascending row
+        indices) that has a finite best score, else the global best. Ties go to
+        the lowest row, as with argmax over a -inf-masked copy of the scores.
+        """
+        for subset in subsets:
+            if subset is None or not len(subset):
+                continue
+            idx = int(subset[np.argmax(scores[subset])])
+            if np.isfinite(scores[idx]):
+                return idx
+        return int(np.argmax(scores))
+
+
+class PlanFilters:
+    """
+    Row subsets of the meal-plan table for every diet value, budget value and
+    diet x budget pair, built once from the canonicalized columns.
+
+    A column that is missing (None) matches every row, like the per-request
+    masks it replaces.
+    """
+
+    def __init__(self, n_rows: int, diets: Optional[Sequence] = None, budgets: Optional[Sequence] = None):
+        self.all_rows = np.arange(n_rows)
+        self.diet = None if diets is None else np.array([_canon_pref(x) for x in diets], dtype=object)
+        self.budget = None if budgets is None else np.array([_canon_budget(x) for x in budgets], dtype=object)
+        self.by_diet: Dict[str, np.ndarray] = {}
+        self.by_budget: Dict[str, np.ndarray] = {}
+        self.by_pair: Dict[Tuple[str, str], np.ndarray] = {}
+        if self.diet is not None:
+            self.by_diet = {v: np.flatnonzero(self.diet == v) for v in set(self.diet)}
+        if self.budget is not None:
+            self.by_budget = {v: np.flatnonzero(self.budget == v) for v in set(self.budget)}
+        if self.diet is not None and self.budget is not None:
+            for d, rows in self.by_diet.items():
+                for b in self.by_budget:
+                    self.by_pair[(d, b)] = rows[self.budget[rows] == b]
+
+    def subsets(self, dietary_preference: Optional[str] = None,
+                budget_preference: Optional[str] = None) -> List[np.ndarray]:
+        """
+        Subsets to try in order: strict (diet and budget), then budget-only,
+        then diet-only. Each one is a dict lookup.
+        """
+        diet = _canon_pref(dietary_preference) if dietary_preference and self.diet is not None else None
+        budget = _canon_budget(budget_preference) if budget_preference and self.budget is not None else None
+        diet_rows = self.all_rows if diet is None else self.by_diet.get(diet, _NO_ROWS)
+        budget_rows = self.all_rows if budget is None else self.by_budget.get(budget, _NO_ROWS)
+        if diet is not None and budget is not None:
+            strict = self.by_pair.get((diet, budget), _NO_ROWS)
+        else:
+            strict = diet_rows if diet is not None else budget_rows
+        subsets = [strict]
+        if budget_preference:
+            subsets.append(budget_rows)
+        if dietary_preference:
+            subsets.append(diet_rows)
+        return subsets
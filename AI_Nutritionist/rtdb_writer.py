@@ -0,0 +1,425 @@
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# Firebase push-id alphabet (ordered so ids sort by creation time)
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+_push_lock = threading.Lock()
+_last_push_ms = 0
+_last_rand: List[int] = [0] * 12
+
+
+def generate_push_id() -> str:
+    """
+    Client-side push id, same format as RTDB's push(): 8 chars of millisecond
+    timestamp + 12 random chars, incremented within the same millisecond so
+    ids from this process stay unique and in order.
+    """
+    global _last_push_ms
+    with _push_lock:
+        now = int(time.time() * 1000)
+        if now == _last_push_ms:
+            i = 11
+            while i >= 0 and _last_rand[i] == 63:
+                _last_rand[i] = 0
+                i -= 1
+            if i >= 0:
+                _last_rand[i] += 1
+        else:
+            _last_push_ms = now
+            for i in range(12):
+                _last_rand[i] = random.randrange(64)
+        chars = []
+        for _ in range(8):
+            chars.append(PUSH_CHARS[now % 64])
+            now //= 64
+        return "".join(reversed(chars)) + "".join(PUSH_CHARS[r] for r in _last_rand)
+
+
+def _split(path: str) -> List[str]:
+    return [p for p in str(path).split("/") if p]
+
+
+class InvalidPathError(ValueError):
+    """A path segment or object key that RTDB would reject."""
+
+
+class WriteQueueFull(RuntimeError):
+    """The write queue stayed full for `put_timeout`; the write was not accepted."""
+
+
+# RTDB keys: UTF-8, at most 768 bytes, none of . $ # [ ] / or ASCII control characters
+_FORBIDDEN_KEY_CHARS = frozenset(".$#[]/" + "".join(map(chr, range(32))) + "\x7f")
+
+
+def check_key(key: str) -> None:
+    if not key or len(key.encode("utf-8")) > 768 or not _FORBIDDEN_KEY_CHARS.isdisjoint(key):
+        raise InvalidPathError(f"invalid database key {key!r}")
+
+
+def check_write(path: str, value: Any) -> None:
+    # Validates every path segment and, recursively, every object key in the value
+    for part in _split(path):
+        check_key(part)
+    stack = [value]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for k, v in node.items():
+                check_key(str(k))
+                stack.append(v)
+        elif isinstance(node, (list, tuple)):
+            stack.extend(node)
+
+
+# -------------------- Local RTDB stand-in --------------------
+class _LocalSnapshot:
+    # The parts of pyrebase's PyreResponse / Pyre used by main.py
+    def __init__(self, key: Optional[str], value: Any):
+        self._key = key
+        self._value = value
+
+    def key(self):
+        return self._key
+
+    def val(self):
+        return self._value
+
+    def each(self):
+        if not isinstance(self._value, dict):
+            return []
+        return [_LocalSnapshot(k, v) for k, v in self._value.items()]
+
+
+class _LocalRef:
+    def __init__(self, store: "LocalRTDB", parts: List[str], order_by: Optional[str] = None,
+                 last: Optional[int] = None):
+        self._store = store
+        self._parts = parts
+        self._order_by = order_by
+        self._last = last
+
+    def child(self, *args):
+        parts = list(self._parts)
+        for a in args:
+            parts.extend(_split(a))
+        return _LocalRef(self._store, parts)
+
+    def order_by_child(self, key: str):
+        return _LocalRef(self._store, self._parts, key, self._last)
+
+    def limit_to_last(self, n: int):
+        return _LocalRef(self._store, self._parts, self._order_by, n)
+
+    def generate_key(self) -> str:
+        return generate_push_id()
+
+    def get(self):
+        value = self._store._read(self._parts)
+        if isinstance(value, dict) and self._order_by:
+            order_by = self._order_by
+            items = sorted(value.items(),
+                           key=lambda kv: (kv[1].get(order_by) if isinstance(kv[1], dict) else None) or 0)
+            if self._last is not None:
+                items = items[-self._last:]
+            value = dict(items)
+        return _LocalSnapshot(self._parts[-1] if self._parts else None, value)
+
+    def set(self, data):
+        self._store._write({"/".join(self._parts): data})
+        return data
+
+    def update(self, data: Dict[str, Any]):
+        prefix = "/".join(self._parts)
+        self._store._write({f"{prefix}/{k}" if prefix else k: v for k, v in data.items()})
+        return data
+
+    def push(self, data):
+        key = generate_push_id()
+        self.child(key).set(data)
+        return {"name": key}
+
+    def remove(self):
+        self._store._write({"/".join(self._parts): None})
+
+
+class LocalRTDB(_LocalRef):
+    """
+    In-process Realtime Database with the pyrebase calls main.py makes
+    (child / get / set / update / push / remove / order_by_child / limit_to_last).
+
+    `latency` adds a delay to every call and `fail_rate` makes that fraction of
+    writes raise ConnectionError, to measure request latency and check that
+    queued writes survive retries without a network. With `path`, the tree is
+    loaded from and saved to a JSON file so data outlives the process.
+    """
+
+    def __init__(self, path: Optional[str] = None, latency: float = 0.0, fail_rate: float = 0.0):
+        super().__init__(self, [])
+        self.path = path
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._root: Dict[str, Any] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._root = json.load(f) or {}
+
+    def _read(self, parts: List[str]):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            node: Any = self._root
+            for p in parts:
+                if not isinstance(node, dict) or p not in node:
+                    return None
+                node = node[p]
+            return copy.deepcopy(node)
+
+    def _write(self, updates: Dict[str, Any]):
+        if self.latency:
+            time.sleep(self.latency)
+        # Like RTDB, one invalid key rejects the whole (multi-path) update
+        for path, value in updates.items():
+            check_write(path, value)
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise ConnectionError("simulated RTDB failure")
+        with self._lock:
+            for path, value in updates.items():
+                parts = _split(path)
+                if not parts:
+                    self._root = copy.deepcopy(value) if isinstance(value, dict) else {}
+                    continue
+                node = self._root
+                for p in parts[:-1]:
+                    if not isinstance(node.get(p), dict):
+                        node[p] = {}
+                    node = node[p]
+                if value is None:
+                    node.pop(parts[-1], None)
+                else:
+                    node[parts[-1]] = copy.deepcopy(value)
+            self.writes += 1
+            if self.path:
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(self._root, f)
+                os.replace(tmp, self.path)
+
+
+# -------------------- Write-behind pipeline --------------------
+class WriteBehindWriter:
+    """
+    Applies RTDB writes on a background thread so requests don't wait on them.
+
+    Writes go into a bounded queue in call order. Paths and object keys are
+    checked on the caller's thread (InvalidPathError), since RTDB rejects a
+    whole multi-path update for one bad key. The worker coalesces whatever is
+    pending into one multi-path update(). Later writes to the same path
+    replace earlier ones, and a path that overlaps one already in the batch
+    starts a new batch. When a batch fails, its writes are tried one by one,
+    and only those that still fail are retried with exponential backoff.
+    After the last attempt they are appended to `dead_letter_path` (if set)
+    instead of being lost. When the queue stays full for `put_timeout`
+    seconds, the write is refused with WriteQueueFull. It never bypasses
+    the queue, because a queued older write to the same path would then
+    land after it.
+    """
+
+    def __init__(self, db, maxsize: int = 10000, batch_max: int = 500, retries: int = 5,
+                 backoff: float = 0.5, backoff_max: float = 30.0, put_timeout: float = 5.0,
+                 dead_letter_path: Optional[str] = None):
+        self.db = db
+        self.batch_max = batch_max
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.put_timeout = put_timeout
+        self.dead_letter_path = dead_letter_path
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+        self._pending = Counter()         # top-level key -> writes not yet applied
+        self._idle = threading.Condition()
+        self._carry = None                # write that could not join the previous batch
+        self._apply_lock = threading.Lock()  # pyrebase refs keep per-call path state
+        self._stopping = False
+        self.stats = Counter()
+        self._thread = threading.Thread(target=self._run, name="rtdb-write-behind", daemon=True)
+        self._thread.start()
+
+    # ---- producer side ----
+    def set(self, path: str, value: Any) -> None:
+        self._enqueue("/".join(_split(path)), value)
+
+    def remove(self, path: str) -> None:
+        self._enqueue("/".join(_split(path)), None)
+
+    def push(self, path: str, value: Any) -> str:
+        # The id is generated here, so callers can return it before the write lands
+        key = generate_push_id()
+        self.set(f"{path}/{key}", value)
+        return key
+
+    def _enqueue(self, path: str, value: Any) -> None:
+        if self._stopping:
+            raise RuntimeError("RTDB writer is closed")
+        check_write(path, value)
+        top = path.split("/", 1)[0]
+        with self._idle:
+            self._pending[top] += 1
+        try:
+            self._queue.put((path, value), timeout=self.put_timeout)
+        except queue.Full:
+            # Backpressure: refuse the write rather than block forever or reorder writes
+            self._done([path])
+            self.stats["rejected"] += 1
+            raise WriteQueueFull(f"RTDB write queue full for {self.put_timeout:.1f}s")
+        self.stats["queued"] += 1
+
+    # ---- consumer side ----
+    def _next_batch(self) -> Dict[str, Any]:
+        batch: Dict[str, Any] = {}
+        first = self._carry or self._queue.get()
+        self._carry = None
+        taken = [first]
+        batch[first[0]] = first[1]
+        while len(batch) < self.batch_max:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            path = item[0]
+            if item[1] is _STOP_VALUE or (path not in batch and any(_overlaps(path, p) for p in batch)):
+                self._carry = item
+                break
+            batch.pop(path, None)     # keep call order for the winning write
+            batch[path] = item[1]
+            taken.append(item)
+        self._taken = taken
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if self._taken[0][1] is _STOP_VALUE:
+                self._queue.task_done()
+                return
+            failed = batch
+            delay = self.backoff
+            for attempt in range(self.retries + 1):
+                failed, error = self._try_apply(failed)
+                if not failed:
+                    break
+                if attempt == self.retries:
+                    logging.error("RTDB write of %d paths failed after %d attempts: %s",
+                                  len(failed), attempt + 1, error)
+                    self._dead_letter(failed)
+                    break
+                self.stats["retries"] += 1
+                time.sleep(min(delay, self.backoff_max) * (0.5 + random.random()))
+                delay *= 2
+            self.stats["batches"] += 1
+            self.stats["written"] += len(batch) - len(failed)
+            self._done([path for path, _ in self._taken])
+            for _ in self._taken:
+                self._queue.task_done()
+
+    def _try_apply(self, updates: Dict[str, Any]):
+        # (writes that failed, last error). One rejected path fails a whole multi-path
+        # update, so a failed batch is split and each write is tried on its own.
+        try:
+            self._apply(updates)
+            return {}, None
+        except Exception as e:
+            if len(updates) == 1:
+                return updates, e
+            error = e
+        self.stats["split_batches"] += 1
+        failed = {}
+        for path, value in updates.items():
+            try:
+                self._apply({path: value})
+            except Exception as e:
+                failed[path] = value
+                error = e
+        return failed, error
+
+    def _apply(self, updates: Dict[str, Any]) -> None:
+        with self._apply_lock:
+            if len(updates) == 1:
+                (path, value), = updates.items()
+                ref = self.db.child(path)
+                if value is None:
+                    ref.remove()
+                else:
+                    ref.set(value)
+            else:
+                self.db.update(updates)
+
+    def _dead_letter(self, batch: Dict[str, Any]) -> None:
+        self.stats["dead_lettered"] += len(batch)
+        if not self.dead_letter_path:
+            return
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts_ms": int(time.time() * 1000), "updates": batch}, default=str) + "\n")
+        except OSError as e:
+            logging.error("Could not write RTDB dead letter file %s: %s", self.dead_letter_path, e)
+
+    def _done(self, paths: List[str]) -> None:
+        with self._idle:
+            for path in paths:
+                top = path.split("/", 1)[0]
+                self._pending[top] -= 1
+                if self._pending[top] <= 0:
+                    del self._pending[top]
+            self._idle.notify_all()
+
+    # ---- read-your-writes / shutdown ----
+    def wait_idle(self, prefix: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Block until no queued write touches `prefix` (its top-level key), or
+        until nothing is queued at all. Reads call this before querying a
+        collection they may have just written.
+        """
+        top = _split(prefix)[0] if prefix else None
+        with self._idle:
+            return self._idle.wait_for(
+                lambda: not self._pending[top] if top else not self._pending, timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return self.wait_idle(None, timeout)
+
+    def close(self, timeout: Optional[float] = 30.0) -> bool:
+        # Drains everything queued so far, then stops the worker
+        flushed = self.flush(timeout)
+        self._stopping = True
+        try:
+            self._queue.put((_STOP, _STOP_VALUE), timeout=timeout)
+        except queue.Full:
+            # Still backed up after the flush timed out; the daemon worker is left
+            # draining rather than hanging shutdown
+            return False
+        self._thread.join(timeout)
+        return flushed
+
+    def pending(self) -> int:
+        with self._idle:
+            return sum(self._pending.values())
+
+
+_STOP = "\0stop"
+_STOP_VALUE = object()
+
+
+def _overlaps(a: str, b: str) -> bool:
+    # RTDB rejects a multi-path update where one path is an ancestor of another
+    return a.startswith(b + "/") or b.startswith(a + "/")
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+# Bump when the validation prompt or schema changes so old verdicts are not reused
+PROMPT_VERSION = 1
+
+
+def _normalize(value: Any) -> Any:
+    # Strip strings and drop nothing else: the key changes only when content does
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def validation_key(plan: Dict[str, Any], conditions: Iterable[str], model: str) -> str:
+    """
+    Stable content hash of a validation request: the plan as plain JSON data
+    (key order and surrounding whitespace ignored), the set of conditions and the
+    model name.
+    """
+    doc = {
+        "v": PROMPT_VERSION,
+        "model": model,
+        "conditions": sorted({str(c).strip() for c in conditions or [] if str(c).strip()}),
+        "plan": _normalize(plan),
+    }
+    blob = json.dumps(doc, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ValidationCache:
+    """
+    Two-tier cache of GPT validation results (stored as plain dicts).
+
+    The memory tier is an LRU of `maxsize` entries. The optional disk tier keeps
+    one JSON file per key under `directory`, so verdicts survive restarts and are
+    shared by workers. Entries older than `ttl` seconds are ignored in both tiers
+    (0 keeps them forever).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 7 * 24 * 3600, directory: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = self.disk_hits = self.misses = self.stores = self.expired = 0
+
+    def _fresh(self, stored_at: float) -> bool:
+        return not self.ttl or time.time() - stored_at < self.ttl
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        expired = False
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if self._fresh(stored_at):
+                    self._data.move_to_end(key)
+                    self.memory_hits += 1
+                    return result
+                del self._data[key]
+                expired = True
+        if self.directory:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    doc = json.load(f)
+                if self._fresh(doc["stored_at"]):
+                    self._remember(key, doc["stored_at"], doc["result"])
+                    with self._lock:
+                        self.disk_hits += 1
+                    return doc["result"]
+                expired = True
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning("Ignoring validation cache file for %s: %s", key, e)
+        with self._lock:
+            self.misses += 1
+            self.expired += expired
+        return None
+
+    def _remember(self, key: str, stored_at: float, result: Dict[str, Any]) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (stored_at, result)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        stored_at = time.time()
+        self._remember(key, stored_at, result)
+        with self._lock:
+            self.stores += 1
+        if self.directory:
+            tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"stored_at": stored_at, "result": result}, f, ensure_ascii=False)
+                os.replace(tmp, self._path(key))
+            except OSError as e:
+                logging.warning("Could not write validation cache file for %s: %s", key, e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "disk": bool(self.directory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "stores": self.stores,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
@@ -1,9 +1,20 @@
 from flask import Flask
 from flask_cors import CORS
+from app.catalog import workout_catalog
+from app.model import start_model_watcher, telemetry
 from app.routes import bp
 
-def create_app():
+def start_watchers():
+    workout_catalog.start_watcher()
+    start_model_watcher()
+    telemetry.start_saver()
+
+def create_app(watch=True):
+    # Pre-fork servers pass watch=False and call start_watchers() in each worker,
+    # since threads started before fork() do not exist in the children
     app = Flask(__name__)
     CORS(app)
     app.register_blueprint(bp)
-    return app
\ No newline at end of file
+    if watch:
+        start_watchers()
+    return app
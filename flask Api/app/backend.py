@@ -0,0 +1,95 @@
+import importlib
+import json
+import logging
+import os
+
+# auto | tflite_runtime | litert | tensorflow
+BACKEND = os.getenv("FITGEN_TFLITE_BACKEND", "auto")
+
+# Lightest first: the standalone runtimes need only NumPy, full TensorFlow is the fallback
+_BACKENDS = {
+    "tflite_runtime": ("tflite_runtime.interpreter", "Interpreter"),
+    "litert": ("ai_edge_litert.interpreter", "Interpreter"),
+    "tensorflow": ("tensorflow", "lite.Interpreter"),
+}
+# Where each runtime keeps the op resolver enum and the external delegate loader
+_EXPERIMENTAL = {
+    "tflite_runtime": "tflite_runtime.interpreter",
+    "litert": "ai_edge_litert.interpreter",
+    "tensorflow": "tensorflow.lite.experimental",
+}
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Interpreter settings written by `python -m benchmarks.sweep_interpreter --write`
+TUNING_FILE = os.getenv("FITGEN_TUNING_FILE") or os.path.join(BASE_DIR, "models", "tuning.json")
+DEFAULT_SETTINGS = {
+    "threads": None,          # None leaves the runtime's default
+    "xnnpack": True,          # False disables the default XNNPACK delegate
+    "delegate": None,         # path to an external delegate library
+    "delegate_options": {},
+}
+
+
+def _resolve(module_name, attr):
+    obj = importlib.import_module(module_name)
+    for part in attr.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def load_interpreter_class(backend=BACKEND):
+    """Return (backend_name, Interpreter class), importing only the chosen runtime."""
+    if backend == "auto":
+        names = list(_BACKENDS)
+    elif backend in _BACKENDS:
+        names = [backend]
+    else:
+        raise ValueError(f"Unknown TFLite backend {backend!r}; expected auto or one of {sorted(_BACKENDS)}")
+    errors = []
+    for name in names:
+        module_name, attr = _BACKENDS[name]
+        try:
+            return name, _resolve(module_name, attr)
+        except ImportError as e:
+            errors.append(f"{name}: {e}")
+    raise ImportError("No TFLite runtime available (" + "; ".join(errors) + ")")
+
+
+def load_interpreter_settings(path=TUNING_FILE):
+    """Interpreter settings from the tuning file, overridden by environment variables."""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(path, encoding="utf-8") as f:
+            tuned = json.load(f)
+        settings.update({k: tuned[k] for k in DEFAULT_SETTINGS if k in tuned})
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logging.warning("Ignoring %s (%s); using default interpreter settings", path, e)
+    if os.getenv("FITGEN_INTERPRETER_THREADS"):
+        settings["threads"] = int(os.environ["FITGEN_INTERPRETER_THREADS"]) or None
+    if os.getenv("FITGEN_XNNPACK"):
+        settings["xnnpack"] = os.environ["FITGEN_XNNPACK"].lower() not in ("0", "false", "off", "no")
+    if os.getenv("FITGEN_DELEGATE") is not None:
+        settings["delegate"] = os.environ["FITGEN_DELEGATE"] or None
+    return settings
+
+
+def interpreter_kwargs(backend, settings):
+    """Keyword arguments for `Interpreter(...)` that apply `settings` on `backend`.
+
+    Called once per interpreter: a loaded external delegate is not shared between
+    interpreters.
+    """
+    kwargs = {}
+    if settings.get("threads"):
+        kwargs["num_threads"] = int(settings["threads"])
+    if settings.get("delegate"):
+        load_delegate = _resolve(_EXPERIMENTAL[backend], "load_delegate")
+        kwargs["experimental_delegates"] = [
+            load_delegate(settings["delegate"], dict(settings.get("delegate_options") or {}))
+        ]
+    if not settings.get("xnnpack", True):
+        op_resolver = _resolve(_EXPERIMENTAL[backend], "OpResolverType")
+        kwargs["experimental_op_resolver_type"] = op_resolver.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    return kwargs
@@ -0,0 +1,182 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from app.watch import start_poller
+
+WORKOUTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'workouts')
+# Seconds between mtime checks of the workouts folder (0 disables reloading)
+RELOAD_INTERVAL = float(os.getenv("FITGEN_CATALOG_RELOAD_INTERVAL", "5"))
+# Single-file catalog written by `python workout.py --format catalog`; preferred over the CSVs
+CATALOG_FILE = 'catalog.json'
+CATALOG_VERSION = 1
+# Serialized like Flask's jsonify (sorted keys, compact, ASCII) so fragments splice into its output
+_DUMPS_OPTIONS = dict(sort_keys=True, separators=(',', ':'), ensure_ascii=True)
+PLAN_NOT_FOUND = {"error": "Workout plan not found"}
+_PLAN_NOT_FOUND_JSON = json.dumps(PLAN_NOT_FOUND, **_DUMPS_OPTIONS)
+
+
+def dumps(obj):
+    return json.dumps(obj, **_DUMPS_OPTIONS)
+
+
+def _level_key(level):
+    # Levels come from JSON bodies; match them the way the old <type>_<level>.csv
+    # path did, so a list or object is "not found" instead of an unhashable key
+    return level if isinstance(level, str) else str(level)
+
+
+class WeeklyPlan(Mapping):
+    """{day: exercises} view of a plan that repeats the same exercises every day.
+
+    Days are expanded on access instead of being stored, and iterate in sorted
+    order like the CSV path.
+    """
+    __slots__ = ('_days', '_exercises')
+
+    def __init__(self, days, exercises):
+        self._days = days
+        self._exercises = exercises
+
+    def __getitem__(self, day):
+        if day not in self._days:
+            raise KeyError(day)
+        return self._exercises
+
+    def __iter__(self):
+        return iter(self._days)
+
+    def __len__(self):
+        return len(self._days)
+
+
+def _read_plan(path):
+    # Same shape as df.groupby('Day')['Exercise'].apply(list): days sorted, file order kept
+    days = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            day, exercise = row.get('Day'), row.get('Exercise')
+            if day and exercise:
+                days.setdefault(day, []).append(exercise)
+    return MappingProxyType({day: tuple(days[day]) for day in sorted(days)})
+
+
+def _read_catalog(path):
+    # One read of the versioned catalog; each exercise list is stored once
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != CATALOG_VERSION:
+        raise ValueError(f"unsupported catalog version {data.get('version')!r}")
+    days = tuple(sorted(data['days']))
+    exercises = data['exercises']
+    index = {}
+    for fitness_type, levels in data['plans'].items():
+        for level, exercise_ids in levels.items():
+            index[(fitness_type, level)] = WeeklyPlan(days, tuple(exercises[i] for i in exercise_ids))
+    return index
+
+
+def _read_csvs(directory, names):
+    index = {}
+    for name in names:
+        if not name.endswith('.csv'):
+            continue
+        # <fitness_type with underscores>_<level>.csv
+        fitness_type, _, level = name[:-len('.csv')].rpartition('_')
+        if not fitness_type:
+            continue
+        index[(fitness_type.replace('_', ' '), level)] = _read_plan(os.path.join(directory, name))
+    return index
+
+
+def _scan(directory):
+    # filename -> mtime for every plan file
+    if not os.path.isdir(directory):
+        return {}
+    return {
+        entry.name: entry.stat().st_mtime_ns
+        for entry in os.scandir(directory)
+        if entry.is_file() and (entry.name.endswith('.csv') or entry.name == CATALOG_FILE)
+    }
+
+
+class WorkoutCatalog:
+    """Immutable (fitness_type, level) -> {day: exercises} index of the workout plans.
+
+    Built from catalog.json when present and at least as new as every CSV,
+    otherwise from the per-plan CSVs. The
+    index is replaced wholesale when a file changes, so lookups never touch the disk.
+    """
+
+    def __init__(self, directory=WORKOUTS_DIR):
+        self.directory = directory
+        self._mtimes = {}
+        self._index = MappingProxyType({})
+        self._fragments = MappingProxyType({})
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.reload()
+
+    def reload(self):
+        with self._lock:
+            mtimes = _scan(self.directory)
+            index = None
+            newest_csv = max((m for name, m in mtimes.items() if name != CATALOG_FILE), default=None)
+            if CATALOG_FILE in mtimes and newest_csv is not None and mtimes[CATALOG_FILE] < newest_csv:
+                # A CSV was regenerated or edited after the catalog; don't serve the stale catalog
+                logging.warning("%s is older than the workout CSVs; loading the CSVs instead "
+                                "(regenerate it with `python workout.py --format both`)", CATALOG_FILE)
+            elif CATALOG_FILE in mtimes:
+                try:
+                    index = _read_catalog(os.path.join(self.directory, CATALOG_FILE))
+                except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+                    logging.warning("Ignoring %s (%s); loading workout CSVs instead", CATALOG_FILE, e)
+            if index is None:
+                index = _read_csvs(self.directory, mtimes)
+            # Pre-serialized JSON and a strong ETag for every plan
+            fragments = {}
+            for key, plan in index.items():
+                body = dumps({day: list(exercises) for day, exercises in plan.items()})
+                fragments[key] = (body, hashlib.sha256(body.encode('utf-8')).hexdigest()[:32])
+            self._mtimes = mtimes
+            self._index = MappingProxyType(index)
+            self._fragments = MappingProxyType(fragments)
+
+    def reload_if_changed(self):
+        if _scan(self.directory) != self._mtimes:
+            self.reload()
+            return True
+        return False
+
+    def start_watcher(self, interval=RELOAD_INTERVAL):
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._watcher = start_poller('workout-catalog-watcher', interval, self.reload_if_changed)
+
+    def get(self, fitness_type, level):
+        return self._index.get((fitness_type, _level_key(level)))
+
+    def get_json(self, fitness_type, level):
+        # (serialized plan, etag) or None
+        return self._fragments.get((fitness_type, _level_key(level)))
+
+    def plans_json(self, predicted_types, level):
+        # The workout_plans object of a /predict response, assembled from cached fragments
+        fragments = self._fragments
+        level = _level_key(level)
+        parts = []
+        for fitness_type in sorted(set(predicted_types)):
+            entry = fragments.get((fitness_type, level))
+            parts.append(dumps(fitness_type) + ':' + (entry[0] if entry else _PLAN_NOT_FOUND_JSON))
+        return '{' + ','.join(parts) + '}'
+
+    def __len__(self):
+        return len(self._index)
+
+
+workout_catalog = WorkoutCatalog()
@@ -1,26 +1,216 @@
+import itertools
+import logging
 import os
+import queue
+import threading
+from contextlib import contextmanager
 import numpy as np
-import tensorflow as tf
-from sklearn.preprocessing import MultiLabelBinarizer
-import pandas as pd
+from app.backend import interpreter_kwargs, load_interpreter_class, load_interpreter_settings
+from app.cache import PredictionCache, feature_key
+from app.catalog import PLAN_NOT_FOUND, workout_catalog
+from app.metrics import stage
+from app.telemetry import PredictionTelemetry
+from app.watch import file_signature, start_poller
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_PATH = os.path.join(BASE_DIR, "models", "fitgen.tflite")
+# Model variant files in app/models/; FITGEN_MODEL_PATH overrides the variant
+MODEL_VARIANTS = {
+    "float32": "fitgen.tflite",
+    "float16": "fitgen_float16.tflite",
+    "int8": "fitgen_int8.tflite",
+}
+MODEL_VARIANT = os.getenv("FITGEN_MODEL_VARIANT", "float32")
+if MODEL_VARIANT not in MODEL_VARIANTS:
+    raise ValueError(f"Unknown FITGEN_MODEL_VARIANT {MODEL_VARIANT!r}; expected one of {sorted(MODEL_VARIANTS)}")
+MODEL_PATH = os.getenv("FITGEN_MODEL_PATH") or os.path.join(BASE_DIR, "models", MODEL_VARIANTS[MODEL_VARIANT])
 LABELS_PATH = os.path.join(BASE_DIR, "labels.txt")
 
-# Load labels
-with open(LABELS_PATH, "r") as f:
-    labels = [line.strip() for line in f if line.strip()]
+# tflite_runtime / LiteRT when installed, full TensorFlow otherwise
+BACKEND_NAME, Interpreter = load_interpreter_class()
+# Thread count and delegates from app/models/tuning.json and FITGEN_* overrides
+INTERPRETER_SETTINGS = load_interpreter_settings()
 
-mlb = MultiLabelBinarizer()
-mlb.fit([labels])
+# Number of interpreters shared by request threads (one per core by default)
+POOL_SIZE = max(1, int(os.getenv("FITGEN_INTERPRETER_POOL_SIZE", os.cpu_count() or 1)))
+# Seconds between checks of the model and labels files (0 disables hot reload)
+MODEL_WATCH_INTERVAL = float(os.getenv("FITGEN_MODEL_WATCH_INTERVAL", "5"))
 
-# Load TFLite model
-interpreter = tf.lite.Interpreter(model_path=MODEL_PATH)
-interpreter.allocate_tensors()
-input_details = interpreter.get_input_details()
-output_details = interpreter.get_output_details()
+def _read_model_files():
+    # Stat before reading: a write that lands mid-read changes the signature again
+    signature = file_signature((MODEL_PATH, LABELS_PATH))
+    with open(LABELS_PATH, "r") as f:
+        labels = [line.strip() for line in f if line.strip()]
+    with open(MODEL_PATH, "rb") as f:
+        content = f.read()
+    return content, labels, signature
+
+class ModelState:
+    """A loaded model, its labels and a pool of interpreters built from it.
+
+    Requests take the current state once and use it throughout, so a reload can
+    swap in a new state while in-flight requests finish on the old one.
+    """
+
+    def __init__(self, content, labels, signature=(), generation=0):
+        # Model bytes are read once; pre-forked workers share them copy-on-write
+        self.content = content
+        self.labels = labels
+        # Column -> label lookup for decoding; the same sorted classes MultiLabelBinarizer().fit([labels]) produces
+        self.label_array = np.array(sorted(set(labels)), dtype=object)
+        self.signature = signature
+        self.generation = generation
+        self.pool = None
+        self.pool_size = 0
+        self.input_details = self.output_details = None
+
+    def _new_interpreter(self):
+        interp = Interpreter(model_content=self.content, **interpreter_kwargs(BACKEND_NAME, INTERPRETER_SETTINGS))
+        interp.allocate_tensors()
+        return interp
+
+    def open_pool(self, size):
+        # A TFLite interpreter is not thread-safe, so every request checks one out
+        # of a bounded pool and returns it when done
+        interpreters = [self._new_interpreter() for _ in range(max(1, size))]
+        output_details = interpreters[0].get_output_details()
+        outputs = int(output_details[0]['shape'][-1])
+        if outputs != len(self.labels):
+            raise ValueError(f"Model has {outputs} outputs but {LABELS_PATH} lists {len(self.labels)} labels")
+        pool = queue.LifoQueue()
+        for interp in interpreters:
+            pool.put(interp)
+        self.input_details = interpreters[0].get_input_details()
+        self.output_details = output_details
+        self.pool_size = len(interpreters)
+        self.pool = pool
+
+    def close_pool(self):
+        self.pool = None
+
+    @contextmanager
+    def checkout(self):
+        pool = self.pool
+        if pool is None:
+            raise RuntimeError("Interpreter pool is not initialised")
+        interp = pool.get()
+        try:
+            yield interp
+        finally:
+            pool.put(interp)
+
+    def invoke(self, interpreter, arr):
+        return invoke_model(interpreter, arr, self.input_details[0], self.output_details[0])
+
+    def run(self, arr):
+        with self.checkout() as interpreter, stage('invoke'):
+            return self.invoke(interpreter, arr)
+
+    def warm_up(self):
+        # Run one inference on every pooled interpreter, bypassing the prediction cache,
+        # so the first real request does not pay for lazy allocation
+        pool = self.pool
+        arr = np.zeros((1, len(FEATURE_ORDER)), dtype=np.float32)
+        interpreters = []
+        try:
+            while True:
+                interpreters.append(pool.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            for interp in interpreters:
+                self.invoke(interp, arr)
+        finally:
+            for interp in interpreters:
+                pool.put(interp)
+        return len(interpreters)
+
+# Load labels and the TFLite model
+_state = ModelState(*_read_model_files())
+labels = _state.labels
+label_array = _state.label_array
+
+def init_interpreter_pool(size=POOL_SIZE):
+    # Also called by pre-fork workers: interpreter thread pools do not survive fork()
+    _state.open_pool(size)
+
+def close_interpreter_pool():
+    # Drop every interpreter, e.g. in a pre-fork master before it forks workers
+    _state.close_pool()
+
+init_interpreter_pool()
+
+def checkout_interpreter():
+    return _state.checkout()
+
+# Repeat profiles skip the model; entries are tagged with the model generation
+# that produced them and the cache is cleared on every reload
+prediction_cache = PredictionCache()
+
+# Distribution of served predictions (probabilities, thresholds, predicted labels)
+telemetry = PredictionTelemetry(_state.labels)
+
+_reload_lock = threading.Lock()
+_rejected_signature = None
+_watcher = None
+
+def reload_model(force=False):
+    """Load, validate and warm the model and labels on disk, then swap them in.
+
+    Returns False when the files are unchanged (and `force` is not set). Raises
+    if the new files are unusable; the current model keeps serving either way.
+    """
+    global _state, labels, label_array, _rejected_signature
+    with _reload_lock:
+        current = _state
+        content, new_labels, signature = _read_model_files()
+        if signature == current.signature and not force:
+            return False
+        state = ModelState(content, new_labels, signature, current.generation + 1)
+        try:
+            state.open_pool(current.pool_size or POOL_SIZE)
+            state.warm_up()
+        except Exception:
+            _rejected_signature = signature
+            raise
+        # A single reference assignment: requests already holding `current` finish on it
+        _state = state
+        labels = state.labels
+        label_array = state.label_array
+        _rejected_signature = None
+        prediction_cache.clear()
+        if state.labels != current.labels:
+            telemetry.reset(state.labels)
+    logging.info("Loaded model generation %d from %s (%d labels)", state.generation, MODEL_PATH, len(state.labels))
+    return True
+
+def reload_model_if_changed():
+    signature = file_signature((MODEL_PATH, LABELS_PATH))
+    if signature == _state.signature or signature == _rejected_signature:
+        return False
+    try:
+        return reload_model()
+    except Exception as e:
+        logging.error("Keeping model generation %d; reload failed: %s", _state.generation, e)
+        return False
+
+def start_model_watcher(interval=MODEL_WATCH_INTERVAL):
+    global _watcher
+    if _watcher and _watcher.is_alive():
+        return
+    _watcher = start_poller('model-watcher', interval, reload_model_if_changed)
+
+def model_info():
+    state = _state
+    return {
+        "generation": state.generation,
+        "path": MODEL_PATH,
+        "variant": MODEL_VARIANT,
+        "backend": BACKEND_NAME,
+        "labels": len(state.labels),
+        "pool_size": state.pool_size,
+        "interpreter": dict(INTERPRETER_SETTINGS),
+    }
 
 def get_dynamic_threshold(probabilities):
     sorted_probs = np.sort(probabilities)[::-1]
@@ -35,43 +225,229 @@ def get_dynamic_threshold(probabilities):
             threshold = sorted_probs[i+1]
     return max(0.05, threshold + 0.01)
 
-def predict(input_data):
+FEATURE_ORDER = [
+    'age', 'height', 'weight', 'weight_loss', 'muscle_gain',
+    'maintain_healthy_weight', 'normal_diabetes', 'high_diabetes',
+    'liver_disease', 'chronic_kidney_disease', 'hypertension',
+    'bmi', 'gender_male'
+]
+
+def build_features(input_data):
     # input_data: dict with keys matching the 13 features
-    feature_order = [
-        'age', 'height', 'weight', 'weight_loss', 'muscle_gain',
-        'maintain_healthy_weight', 'normal_diabetes', 'high_diabetes',
-        'liver_disease', 'chronic_kidney_disease', 'hypertension',
-        'bmi', 'gender_male'
-    ]
     # Compute BMI if not provided
     if 'bmi' not in input_data or input_data['bmi'] is None:
         input_data['bmi'] = input_data['weight'] / (input_data['height'] ** 2)
     # Ensure all features are present
-    features = [float(input_data.get(f, 0.0)) for f in feature_order]
-    arr = np.array([features], dtype=np.float32)
-    interpreter.set_tensor(input_details[0]['index'], arr)
+    return [float(input_data.get(f, 0.0)) for f in FEATURE_ORDER]
+
+def invoke_model(interpreter, arr, input_detail, output_detail):
+    # arr: [N, 13] float32 -> [N, labels] float32 probabilities
+    input_index = input_detail['index']
+    if input_detail['dtype'] != np.float32:
+        # Fully integer-quantized models take int8/uint8 inputs
+        scale, zero_point = input_detail['quantization']
+        info = np.iinfo(input_detail['dtype'])
+        arr = np.clip(np.round(arr / scale) + zero_point, info.min, info.max).astype(input_detail['dtype'])
+    # Resize the input tensor only when the batch size changes
+    if tuple(interpreter.get_input_details()[0]['shape']) != arr.shape:
+        interpreter.resize_tensor_input(input_index, arr.shape)
+        interpreter.allocate_tensors()
+    interpreter.set_tensor(input_index, arr)
     interpreter.invoke()
-    probs = interpreter.get_tensor(output_details[0]['index'])[0]
-    threshold = get_dynamic_threshold(probs)
-    predicted_binarized = (probs >= threshold).astype(int)
-    predicted_labels = mlb.inverse_transform(predicted_binarized.reshape(1, -1))
+    # get_tensor returns a copy, so the interpreter can go back to the pool
+    out = interpreter.get_tensor(output_detail['index'])
+    if output_detail['dtype'] != np.float32:
+        scale, zero_point = output_detail['quantization']
+        out = (out.astype(np.float32) - zero_point) * np.float32(scale)
+    return out
+
+def run_model(arr):
+    return _state.run(arr)
+
+def warm_up():
+    return _state.warm_up()
+
+# Dtype of `float32 + 0.01` in the scalar path above (float64 on NumPy 1.x, float32 under NEP 50)
+_THRESHOLD_DTYPE = type(np.float32(0) + 0.01)
+
+def get_dynamic_thresholds(prob_matrix):
+    # Row-wise get_dynamic_threshold for an [N, labels] matrix, without a Python loop
+    probs = np.asarray(prob_matrix)
+    sorted_probs = np.sort(probs, axis=1)[:, ::-1]
+    gaps = sorted_probs[:, :-1] - sorted_probs[:, 1:]
+    # argmax returns the first largest gap, matching the strict '>' in the loop
+    largest = np.argmax(gaps, axis=1)
+    rows = np.arange(len(probs))
+    below_gap = (sorted_probs[rows, largest + 1].astype(_THRESHOLD_DTYPE) + 0.01).astype(np.float64)
+    thresholds = np.where(gaps[rows, largest] > 0.0, below_gap, 0.15 + 0.01)
+    thresholds = np.maximum(0.05, thresholds)
+    thresholds[sorted_probs[:, 0] < 0.1] = 0.05
+    return thresholds
+
+def decode_predictions(prob_matrix, state=None):
+    state = state or _state
+    probs = np.asarray(prob_matrix)
+    thresholds = get_dynamic_thresholds(probs)
+    # Compare in the probabilities' dtype, as `probs >= threshold` does for a scalar threshold
+    predicted = probs >= thresholds.astype(probs.dtype)[:, None]
+    return [
+        {
+            "probabilities": dict(zip(state.labels, row.tolist())),
+            "predicted_types": state.label_array[mask].tolist(),
+            "threshold": float(threshold)
+        }
+        for row, mask, threshold in zip(probs, predicted, thresholds)
+    ]
+
+def _copy_result(result):
+    # Callers add keys such as workout_plans, so never hand out the cached dict
     return {
-        "probabilities": {labels[i]: float(probs[i]) for i in range(len(labels))},
-        "predicted_types": list(predicted_labels[0]),
-        "threshold": float(threshold)
+        "probabilities": dict(result["probabilities"]),
+        "predicted_types": list(result["predicted_types"]),
+        "threshold": result["threshold"]
     }
 
+def _score_entries(arr, state=None, observe=True):
+    # arr: [N, 13] float32 -> [(probabilities row, result)]. Cached rows skip the
+    # model; the rest share one invoke. Served predictions feed the telemetry.
+    state = state or _state
+    with stage('cache'):
+        keys = [feature_key(row) for row in arr]
+        entries = []
+        for key in keys:
+            cached = prediction_cache.get(key)
+            # Entries from before a reload are misses, even if they beat the clear()
+            entries.append(cached[1:] if cached is not None and cached[0] == state.generation else None)
+        missing = [i for i, entry in enumerate(entries) if entry is None]
+    if missing:
+        probs = state.run(arr[missing])
+        with stage('threshold'):
+            decoded = decode_predictions(probs, state)
+        for i, row_probs, result in zip(missing, probs, decoded):
+            entries[i] = (row_probs, result)
+            prediction_cache.put(keys[i], (state.generation, row_probs, result))
+    if observe and entries:
+        telemetry.observe([row_probs for row_probs, _ in entries], [result["threshold"] for _, result in entries])
+    return entries
+
+def score_features(arr, observe=True):
+    return [_copy_result(result) for _, result in _score_entries(arr, observe=observe)]
+
+def score_arrays(arr):
+    # ([N, labels] float32 probabilities, [N] thresholds) for callers that skip the dicts
+    state = _state
+    entries = _score_entries(arr, state)
+    probs = np.array([row_probs for row_probs, _ in entries], dtype=np.float32).reshape(len(entries), len(state.labels))
+    thresholds = np.array([result["threshold"] for _, result in entries], dtype=np.float64)
+    return probs, thresholds
+
+def fill_bmi(arr):
+    # Raw feature rows may leave bmi as NaN; derive it like build_features does
+    bmi = FEATURE_ORDER.index('bmi')
+    missing = np.isnan(arr[:, bmi])
+    if missing.any():
+        weight = arr[missing, FEATURE_ORDER.index('weight')].astype(np.float64)
+        height = arr[missing, FEATURE_ORDER.index('height')].astype(np.float64)
+        arr[missing, bmi] = weight / height ** 2
+    return arr
+
+def predict(input_data):
+    with stage('features'):
+        arr = np.array([build_features(input_data)], dtype=np.float32)
+    return score_features(arr)[0]
+
+def predict_batch(inputs):
+    # inputs: list of dicts, scored with a single invoke over an [N, 13] matrix
+    if not inputs:
+        return []
+    with stage('features'):
+        arr = np.array([build_features(d) for d in inputs], dtype=np.float32)
+    return score_features(arr)
+
+# Upper bound on scenarios per what-if request (base profile not included)
+MAX_SCENARIOS = int(os.getenv("FITGEN_MAX_SCENARIOS", "1024"))
+GOALS = ('weight_loss', 'muscle_gain', 'maintain_healthy_weight')
+
+def expand_scenarios(grid=None, scenarios=None, limit=MAX_SCENARIOS):
+    # Change sets for a what-if request: the cartesian product of `grid`
+    # ({feature: [values]}) followed by the explicit `scenarios` ([{feature: value}])
+    changes = []
+    if grid:
+        if not isinstance(grid, dict) or not all(isinstance(v, list) and v for v in grid.values()):
+            raise ValueError('grid must map features to non-empty lists of values')
+        size = 1
+        for values in grid.values():
+            size *= len(values)
+        if size > limit:
+            raise ValueError(f'grid has {size} scenarios; the limit is {limit}')
+        changes.extend(dict(zip(grid, values)) for values in itertools.product(*grid.values()))
+    if scenarios:
+        if not isinstance(scenarios, list) or not all(isinstance(c, dict) for c in scenarios):
+            raise ValueError('scenarios must be a list of objects')
+        changes.extend(scenarios)
+    if not changes:
+        raise ValueError('grid or scenarios is required')
+    if len(changes) > limit:
+        raise ValueError(f'{len(changes)} scenarios; the limit is {limit}')
+    for change in changes:
+        unknown = set(change) - set(FEATURE_ORDER) - {'goal'}
+        if unknown:
+            raise ValueError(f'unknown features: {sorted(unknown)}')
+        if 'goal' in change and change['goal'] not in GOALS:
+            raise ValueError(f'goal must be one of {list(GOALS)}')
+        for feature, value in change.items():
+            # bmi: null means "derive it from height and weight"
+            if feature == 'goal' or (feature == 'bmi' and value is None):
+                continue
+            if not isinstance(value, (int, float)) or not np.isfinite(value):
+                raise ValueError(f'{feature} must be a finite number, got {value!r}')
+    return changes
+
+def apply_scenario(base, change):
+    # `goal` switches the one-hot goal flags; BMI is re-derived when height or
+    # weight changes unless the scenario sets it
+    profile = dict(base)
+    change = dict(change)
+    goal = change.pop('goal', None)
+    if goal is not None:
+        profile.update({g: 1.0 if g == goal else 0.0 for g in GOALS})
+    profile.update(change)
+    if 'bmi' not in change and ('height' in change or 'weight' in change):
+        profile.pop('bmi', None)
+    return profile
+
+def what_if(base, changes):
+    # Scores the base profile and every scenario as one [1 + N, 13] matrix
+    # (cached rows skip the model, the rest share one invoke)
+    with stage('features'):
+        arr = np.array([build_features(dict(base))]
+                       + [build_features(apply_scenario(base, change)) for change in changes], dtype=np.float32)
+    # Hypothetical profiles are not real traffic, so they stay out of the telemetry
+    results = score_features(arr, observe=False)
+    base_result = results[0]
+    base_types = set(base_result['predicted_types'])
+    diffs = []
+    for change, result in zip(changes, results[1:]):
+        types = set(result['predicted_types'])
+        diffs.append({
+            "changes": change,
+            "predicted_types": result['predicted_types'],
+            "threshold": result['threshold'],
+            "added": sorted(types - base_types),
+            "removed": sorted(base_types - types),
+            "changed": types != base_types,
+        })
+    base_result = {"predicted_types": base_result['predicted_types'], "threshold": base_result['threshold']}
+    return base_result, diffs
+
+@stage('workouts')
 def get_workout_plans(predicted_types, level):
-    output_dir = os.path.join(os.path.dirname(__file__), 'workouts')
+    # Served from the in-memory catalog; no file I/O on the request path
     plans = {}
     for fitness_type in predicted_types:
-        filename = f"{fitness_type.replace(' ', '_')}_{level}.csv"
-        file_path = os.path.join(output_dir, filename)
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
-            # Group by day for easier frontend display
-            plan = df.groupby('Day')['Exercise'].apply(list).to_dict()
-            plans[fitness_type] = plan
+        plan = workout_catalog.get(fitness_type, level)
+        if plan is not None:
+            plans[fitness_type] = {day: list(exercises) for day, exercises in plan.items()}
         else:
-            plans[fitness_type] = {"error": "Workout plan not found"}
-    return plans
\ No newline at end of file
+            plans[fitness_type] = dict(PLAN_NOT_FOUND)
+    return plans
@@ -1,21 +1,232 @@
-from flask import Blueprint, request, jsonify
-from app.model import predict, get_workout_plans  # <-- Add get_workout_plans here
+import hmac
+import os
+import time
+
+from flask import Blueprint, Response, current_app, g, request, jsonify
+import numpy as np
+
+from app import wire
+from app.catalog import PLAN_NOT_FOUND, dumps, workout_catalog
+from app.metrics import registry, server_timing, stage, start_request
+from app.model import (FEATURE_ORDER, build_features, expand_scenarios, fill_bmi, get_workout_plans,
+                       model_info, predict, predict_batch, prediction_cache, reload_model, score_arrays,
+                       score_features, telemetry, what_if)
+
+# Bearer token for /admin endpoints; they are disabled when unset
+ADMIN_TOKEN = os.getenv("FITGEN_ADMIN_TOKEN", "")
 
 
 bp = Blueprint('main', __name__)
 
+@bp.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+    start_request()
+
+@bp.after_request
+def _record_request(response):
+    endpoint = request.endpoint or 'unknown'
+    elapsed = time.perf_counter() - g.request_start
+    registry.histogram('fitgen_request_seconds', endpoint=endpoint).observe(elapsed)
+    registry.inc('fitgen_requests_total', endpoint=endpoint, status=response.status_code)
+    if response.status_code >= 400:
+        registry.inc('fitgen_errors_total', endpoint=endpoint, status=response.status_code)
+    timing = server_timing()
+    response.headers['Server-Timing'] = (timing + ', ' if timing else '') + f"total;dur={elapsed * 1e3:.3f}"
+    return response
+
+def _prediction_json(result, level):
+    # Same bytes as jsonify(result + workout_plans), with the plans spliced in from the
+    # catalog's pre-serialized fragments ("workout_plans" sorts after the other keys)
+    head = dumps(result)
+    return head[:-1] + ',"workout_plans":' + workout_catalog.plans_json(result['predicted_types'], level) + '}'
+
+def _non_object_input(inputs):
+    # Index of the first batch item that is not a JSON object, or None
+    return next((i for i, item in enumerate(inputs) if not isinstance(item, dict)), None)
+
+def _is_compact():
+    # Raw float32 or MessagePack on either side of the exchange
+    return request.mimetype in wire.COMPACT_MIMETYPES or wire.response_mimetype(request) != wire.JSON_MIMETYPE
+
+def _inputs_and_levels(data, batch):
+    # Validate a decoded JSON/MessagePack document the same way as the JSON routes
+    if batch:
+        if not data or not isinstance(data.get('inputs'), list) or 'level' not in data:
+            raise ValueError('Invalid input')
+        inputs, levels = data['inputs'], data['level']
+        bad = _non_object_input(inputs)
+        if bad is not None:
+            raise ValueError(f'inputs[{bad}] must be an object')
+        if not isinstance(levels, list):
+            levels = [levels] * len(inputs)
+        elif len(levels) != len(inputs):
+            raise ValueError('level list must match inputs length')
+        return inputs, levels
+    if not data or 'input' not in data or 'level' not in data:
+        raise ValueError('Invalid input')
+    return [data['input']], [data['level']]
+
+def _compact_prediction(batch):
+    # /predict and /predict/batch for raw float32 and MessagePack bodies or responses
+    out_type = wire.response_mimetype(request)
+    if wire.msgpack is None and (
+            request.mimetype in wire.MSGPACK_MIMETYPES or out_type in wire.MSGPACK_MIMETYPES):
+        return jsonify({'error': 'MessagePack support needs the msgpack package'}), 415
+    try:
+        with stage('parse'):
+            if request.mimetype == wire.F32_MIMETYPE:
+                arr = fill_bmi(wire.decode_rows(request.get_data(), len(FEATURE_ORDER)))
+                level = request.args.get('level') or request.headers.get('X-Fitgen-Level')
+                levels = [level] * len(arr)
+            else:
+                if request.mimetype in wire.MSGPACK_MIMETYPES:
+                    data = wire.unpack(request.get_data())
+                else:
+                    data = request.get_json()
+                inputs, levels = _inputs_and_levels(data, batch)
+                with stage('features'):
+                    arr = np.array([build_features(d) for d in inputs], dtype=np.float32)
+        if not batch and len(arr) != 1:
+            raise ValueError('/predict takes exactly one row; use /predict/batch')
+        if out_type != wire.F32_MIMETYPE and any(level is None for level in levels):
+            raise ValueError('level is required')
+    except Exception as e:
+        return jsonify({'error': str(e) or 'Invalid input'}), 400
+
+    try:
+        if out_type == wire.F32_MIMETYPE:
+            probs, thresholds = score_arrays(arr)
+            return Response(wire.encode_rows(probs, thresholds), mimetype=wire.F32_MIMETYPE)
+        results = score_features(arr)
+        if out_type in wire.MSGPACK_MIMETYPES:
+            for result, level in zip(results, levels):
+                result['workout_plans'] = get_workout_plans(result['predicted_types'], level)
+            return Response(wire.pack({'results': results} if batch else results[0]), mimetype=out_type)
+        with stage('workouts'):
+            parts = [_prediction_json(result, level) for result, level in zip(results, levels)]
+        body = '{"results":[' + ','.join(parts) + ']}' if batch else parts[0]
+        return Response(body + '\n', mimetype=wire.JSON_MIMETYPE)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/predict', methods=['POST'])
 def make_prediction():
-    data = request.get_json()
-    print(data)
+    if _is_compact():
+        return _compact_prediction(batch=False)
+    with stage('parse'):
+        data = request.get_json()
+    current_app.logger.debug("predict request: %s", data)
     if not data or 'input' not in data or 'level' not in data:
         return jsonify({'error': 'Invalid input'}), 400
     input_data = data['input']
     level = data['level']
     try:
         result = predict(input_data)
-        workout_plans = get_workout_plans(result['predicted_types'], level)
-        result['workout_plans'] = workout_plans
-        return jsonify(result)
+        with stage('workouts'):
+            body = _prediction_json(result, level)
+        return Response(body + '\n', mimetype='application/json')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/predict/batch', methods=['POST'])
+def make_batch_prediction():
+    # Body: {"inputs": [{...}, ...], "level": "Easy" | ["Easy", "Advanced", ...]}
+    if _is_compact():
+        return _compact_prediction(batch=True)
+    with stage('parse'):
+        data = request.get_json()
+    if not data or not isinstance(data.get('inputs'), list) or 'level' not in data:
+        return jsonify({'error': 'Invalid input'}), 400
+    inputs = data['inputs']
+    bad = _non_object_input(inputs)
+    if bad is not None:
+        return jsonify({'error': f'inputs[{bad}] must be an object'}), 400
+    levels = data['level']
+    if isinstance(levels, list):
+        if len(levels) != len(inputs):
+            return jsonify({'error': 'level list must match inputs length'}), 400
+    else:
+        levels = [levels] * len(inputs)
+    try:
+        results = predict_batch(inputs)
+        with stage('workouts'):
+            body = '{"results":[' + ','.join(
+                _prediction_json(result, level) for result, level in zip(results, levels)) + ']}'
+        return Response(body + '\n', mimetype='application/json')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/predict/what-if', methods=['POST'])
+def make_what_if_prediction():
+    # Body: {"input": {...}, "grid": {"weight": [70, 80], "goal": ["weight_loss", ...]},
+    #        "scenarios": [{"weight_loss": 0, "muscle_gain": 1}, ...]}
+    with stage('parse'):
+        data = request.get_json()
+    if not data or not isinstance(data.get('input'), dict):
+        return jsonify({'error': 'Invalid input'}), 400
+    try:
+        changes = expand_scenarios(data.get('grid'), data.get('scenarios'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        base, scenarios = what_if(data['input'], changes)
+        return jsonify({'base': base, 'scenarios': scenarios})
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/workout-plans/<fitness_type>/<level>', methods=['GET'])
+def get_workout_plan(fitness_type, level):
+    # Cacheable per-plan endpoint: strong ETag, 304 on a matching If-None-Match
+    entry = (workout_catalog.get_json(fitness_type, level)
+             or workout_catalog.get_json(fitness_type.replace('_', ' '), level))
+    if entry is None:
+        return jsonify(PLAN_NOT_FOUND), 404
+    body, etag = entry
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
+
+@bp.route('/admin/reload-model', methods=['POST'])
+def admin_reload_model():
+    # Loads, validates and warms the model on disk while the current one keeps serving
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {ADMIN_TOKEN}".encode('utf-8')):
+        return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        reloaded = reload_model(force=request.args.get('force') == '1')
+    except Exception as e:
+        return jsonify({'error': f'Reload failed: {e}', 'model': model_info()}), 409
+    return jsonify({'reloaded': reloaded, 'model': model_info()})
+
+
+@bp.route('/telemetry', methods=['GET'])
+def prediction_telemetry():
+    return jsonify(telemetry.snapshot())
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    cache = prediction_cache.stats()
+    served = telemetry.snapshot()
+    extra = [
+        ('fitgen_predictions_total', 'counter', served['predictions']),
+        ('fitgen_predictions_no_label_total', 'counter', served['no_label']),
+        ('fitgen_model_generation', 'gauge', model_info()['generation']),
+        ('fitgen_prediction_cache_entries', 'gauge', cache['size']),
+        ('fitgen_prediction_cache_hits_total', 'counter', cache['hits']),
+        ('fitgen_prediction_cache_misses_total', 'counter', cache['misses']),
+        ('fitgen_prediction_cache_evictions_total', 'counter', cache['evictions']),
+    ]
+    return Response(registry.render(extra), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,156 @@
+import collections
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from app.watch import start_poller
+
+# Equal-width bins over [0, 1] for probabilities and thresholds
+BINS = int(os.getenv("FITGEN_TELEMETRY_BINS", "20"))
+# Aggregates are written here periodically and restored at startup (unset: memory only)
+SNAPSHOT_FILE = os.getenv("FITGEN_TELEMETRY_FILE", "")
+SNAPSHOT_INTERVAL = float(os.getenv("FITGEN_TELEMETRY_SNAPSHOT_INTERVAL", "60"))
+SNAPSHOT_VERSION = 1
+
+
+class _Shard:
+    # Counters updated by one thread at a time
+    __slots__ = ('predictions', 'no_label', 'label_counts', 'set_sizes', 'probability_hist', 'threshold_hist')
+
+    def __init__(self, n_labels, bins):
+        self.predictions = np.zeros(1, dtype=np.int64)
+        self.no_label = np.zeros(1, dtype=np.int64)
+        self.label_counts = np.zeros(n_labels, dtype=np.int64)
+        self.set_sizes = np.zeros(n_labels + 1, dtype=np.int64)
+        self.probability_hist = np.zeros((n_labels, bins), dtype=np.int64)
+        self.threshold_hist = np.zeros(bins, dtype=np.int64)
+
+
+class PredictionTelemetry:
+    """Constant-memory aggregates of what the model predicts.
+
+    Keeps fixed-bin histograms of every label's probability and of the dynamic
+    threshold, how often each label is predicted, and how many labels each
+    prediction has (0 means nothing passed the threshold). Like the interpreter
+    pool, each update checks a shard out of a free list. deque.pop() and
+    append() are atomic, so concurrent requests never share a shard and never
+    take a lock. There is one shard per concurrent caller at peak, and reads sum
+    them all.
+    """
+
+    def __init__(self, labels, bins=BINS, snapshot_path=SNAPSHOT_FILE):
+        self.bins = bins
+        self.snapshot_path = snapshot_path
+        self._saver = None
+        self.reset(labels)
+        if snapshot_path:
+            self.restore()
+
+    def reset(self, labels):
+        # Called when the label set changes; requests still holding an old shard
+        # return it to the old free list
+        self.labels = list(labels)
+        self.started = time.time()
+        self._shards = []
+        self._free = collections.deque()
+
+    def _checkout(self):
+        free, shards = self._free, self._shards
+        try:
+            return free, free.pop()
+        except IndexError:
+            shard = _Shard(len(self.labels), self.bins)
+            shards.append(shard)
+            return free, shard
+
+    def observe(self, probs, thresholds):
+        # probs: [N, labels] probabilities; thresholds: [N]. O(N * labels) with no locks
+        probs = np.asarray(probs)
+        n, n_labels = probs.shape
+        if n == 0 or n_labels != len(self.labels):
+            return
+        predicted = probs >= np.asarray(thresholds).astype(probs.dtype)[:, None]
+        sizes = predicted.sum(axis=1)
+        bins = np.clip((probs * self.bins).astype(np.intp), 0, self.bins - 1)
+        flat = bins + np.arange(n_labels) * self.bins
+        threshold_bins = np.clip((np.asarray(thresholds) * self.bins).astype(np.intp), 0, self.bins - 1)
+
+        free, shard = self._checkout()
+        try:
+            shard.predictions += n
+            shard.no_label += int((sizes == 0).sum())
+            shard.label_counts += predicted.sum(axis=0)
+            shard.set_sizes += np.bincount(sizes, minlength=n_labels + 1)
+            shard.probability_hist += np.bincount(flat.ravel(), minlength=n_labels * self.bins).reshape(n_labels, -1)
+            shard.threshold_hist += np.bincount(threshold_bins, minlength=self.bins)
+        finally:
+            free.append(shard)
+
+    def _totals(self):
+        totals = _Shard(len(self.labels), self.bins)
+        # Reads race with updates; a shard mid-update is off by at most that update
+        for shard in list(self._shards):
+            for name in _Shard.__slots__:
+                getattr(totals, name)[...] += getattr(shard, name)
+        return totals
+
+    def snapshot(self):
+        totals = self._totals()
+        predictions = int(totals.predictions[0])
+        return {
+            "version": SNAPSHOT_VERSION,
+            "since": self.started,
+            "predictions": predictions,
+            "no_label": int(totals.no_label[0]),
+            "no_label_rate": int(totals.no_label[0]) / predictions if predictions else 0.0,
+            "bin_edges": np.linspace(0.0, 1.0, self.bins + 1).round(6).tolist(),
+            "threshold_histogram": totals.threshold_hist.tolist(),
+            "predicted_label_counts": dict(zip(self.labels, totals.label_counts.tolist())),
+            "predicted_set_sizes": totals.set_sizes.tolist(),
+            "probability_histograms": dict(zip(self.labels, totals.probability_hist.tolist())),
+        }
+
+    def save(self, path=None):
+        path = path or self.snapshot_path
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def restore(self, path=None):
+        # Seeds a shard with a saved snapshot; skipped if the labels or bins differ
+        path = path or self.snapshot_path
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logging.warning("Ignoring telemetry snapshot %s (%s)", path, e)
+            return False
+        if (data.get('version') != SNAPSHOT_VERSION or len(data.get('bin_edges', ())) != self.bins + 1
+                or list(data.get('predicted_label_counts', {})) != self.labels):
+            logging.warning("Ignoring telemetry snapshot %s: labels or bins changed", path)
+            return False
+        free, shard = self._checkout()
+        try:
+            shard.predictions += data['predictions']
+            shard.no_label += data['no_label']
+            shard.label_counts += [data['predicted_label_counts'][label] for label in self.labels]
+            shard.set_sizes += data['predicted_set_sizes']
+            shard.probability_hist += [data['probability_histograms'][label] for label in self.labels]
+            shard.threshold_hist += data['threshold_histogram']
+        finally:
+            free.append(shard)
+        self.started = data['since']
+        return True
+
+    def start_saver(self, interval=SNAPSHOT_INTERVAL):
+        if not self.snapshot_path or (self._saver and self._saver.is_alive()):
+            return
+        self._saver = start_poller('telemetry-snapshot', interval, self.save)
@@ -0,0 +1,37 @@
+import logging
+import os
+import threading
+import time
+
+
+def file_signature(paths):
+    # (mtime, size) per path; None for files that are missing
+    sig = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+
+def start_poller(name, interval, check):
+    """Call check() every `interval` seconds on a daemon thread.
+
+    Returns the thread, or None when polling is disabled (interval <= 0).
+    """
+    if interval <= 0:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                check()
+            except Exception:
+                logging.exception("%s poll failed", name)
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
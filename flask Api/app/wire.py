@@ -0,0 +1,62 @@
+"""Compact wire formats for high-volume /predict callers, next to the JSON contract.
+
+``application/x-fitgen-f32``
+    Request: N rows of the 13 features in FEATURE_ORDER as little-endian float32,
+    row-major, no header. A NaN bmi is derived from height and weight.
+    Response: N rows of len(labels) + 1 little-endian float32 values: the
+    probabilities in labels.txt order followed by the threshold. A label is
+    predicted when its probability >= the threshold (compared in float32).
+    The level for JSON/MessagePack responses comes from ``?level=`` or the
+    ``X-Fitgen-Level`` header.
+
+``application/msgpack``
+    Same document structure as the JSON API, MessagePack-encoded. Needs the
+    optional ``msgpack`` package.
+"""
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+F32_MIMETYPE = 'application/x-fitgen-f32'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+COMPACT_MIMETYPES = (F32_MIMETYPE,) + MSGPACK_MIMETYPES
+SUPPORTED_MIMETYPES = (JSON_MIMETYPE,) + COMPACT_MIMETYPES
+
+_F32 = np.dtype('<f4')
+
+
+def response_mimetype(request):
+    # Honour Accept; without one, answer in the format the request was sent in
+    if not request.accept_mimetypes:
+        return request.mimetype if request.mimetype in SUPPORTED_MIMETYPES else JSON_MIMETYPE
+    return request.accept_mimetypes.best_match(SUPPORTED_MIMETYPES, default=JSON_MIMETYPE)
+
+
+def decode_rows(body, n_features):
+    if not body or len(body) % (_F32.itemsize * n_features):
+        raise ValueError(f"body must be a non-empty multiple of {n_features} float32 values")
+    # Copy: frombuffer views are read-only and the caller fills in bmi
+    return np.frombuffer(body, dtype=_F32).reshape(-1, n_features).astype(np.float32)
+
+
+def encode_rows(probs, thresholds):
+    out = np.empty((len(probs), probs.shape[1] + 1), dtype=_F32)
+    out[:, :-1] = probs
+    out[:, -1] = thresholds
+    return out.tobytes()
+
+
+def unpack(body):
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.unpackb(body, raw=False)
+
+
+def pack(obj):
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.packb(obj, use_bin_type=True)
@@ -1,6 +1,7 @@
 # Updating exercise database with more advanced exercises for Intermediate and Advanced levels
 
-import pandas as pd
+import argparse
+import json
 import os
 
 # Fitness types list
@@ -93,26 +94,72 @@ exercise_database_advanced = {
         "Advanced": ["Cone drills with reaction sprints", "Resisted band sprints", "Change of direction drills with ball reaction"]
     }
 }
-# Re-generate CSVs with updated exercises in current directory
-output_dir = os.path.join(os.getcwd(), 'workouts')  # Save in "workouts" folder in current directory
-os.makedirs(output_dir, exist_ok=True)
-
-csv_files_advanced = []
-
-for fitness in fitness_types:
-    # Loop through each level (Easy, Intermediate, Advanced) to create separate files
-    for level, exercises in exercise_database_advanced[fitness].items():
-        rows = []
-        for day in days:
-            for ex in exercises:
-                rows.append({"Day": day, "Level": level, "Exercise": ex})
-
-        df = pd.DataFrame(rows)
-        # Create a new file path that includes both fitness type and level
-        file_path = os.path.join(output_dir, f"{fitness.replace(' ', '_')}_{level}.csv")
-        df.to_csv(file_path, index=False)
-        csv_files_advanced.append(file_path)
-
-print("\nSuccessfully generated the following files in current directory:")
-for f in csv_files_advanced:
-    print(f)
+CATALOG_VERSION = 1
+
+
+def write_csvs(output_dir):
+    # One human-readable CSV per fitness type and level, one row per day and exercise
+    import pandas as pd
+
+    csv_files_advanced = []
+    for fitness in fitness_types:
+        # Loop through each level (Easy, Intermediate, Advanced) to create separate files
+        for level, exercises in exercise_database_advanced[fitness].items():
+            rows = []
+            for day in days:
+                for ex in exercises:
+                    rows.append({"Day": day, "Level": level, "Exercise": ex})
+
+            df = pd.DataFrame(rows)
+            # Create a new file path that includes both fitness type and level
+            file_path = os.path.join(output_dir, f"{fitness.replace(' ', '_')}_{level}.csv")
+            df.to_csv(file_path, index=False)
+            csv_files_advanced.append(file_path)
+    return csv_files_advanced
+
+
+def build_catalog():
+    # Every distinct exercise string is stored once; plans refer to them by index and
+    # the weekly schedule is shared by all plans (expanded by app/catalog.py on access)
+    exercise_ids = {}
+    plans = {}
+    for fitness in fitness_types:
+        for level, exercises in exercise_database_advanced[fitness].items():
+            plans.setdefault(fitness, {})[level] = [
+                exercise_ids.setdefault(ex, len(exercise_ids)) for ex in exercises
+            ]
+    return {
+        "version": CATALOG_VERSION,
+        "days": days,
+        "exercises": list(exercise_ids),
+        "plans": plans,
+    }
+
+
+def write_catalog(output_dir):
+    file_path = os.path.join(output_dir, "catalog.json")
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(build_catalog(), f, ensure_ascii=False, separators=(",", ":"))
+    return [file_path]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate workout plans")
+    parser.add_argument("--format", choices=["csv", "catalog", "both"], default="csv",
+                        help="per-plan CSVs for humans, a single catalog.json for the API, or both")
+    # Save in "workouts" folder in current directory by default
+    parser.add_argument("--output-dir", default=os.path.join(os.getcwd(), 'workouts'))
+    args = parser.parse_args()
+
+    output_dir = args.output_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    generated = []
+    if args.format in ("csv", "both"):
+        generated += write_csvs(output_dir)
+    if args.format in ("catalog", "both"):
+        generated += write_catalog(output_dir)
+
+    print("\nSuccessfully generated the following files in current directory:")
+    for f in generated:
+        print(f)
@@ -0,0 +1,44 @@
+"""Load time of the workout plans: single catalog.json vs one CSV per plan.
+
+Run from the ``flask Api`` directory:
+
+    python -m benchmarks.bench_catalog_load --repeat 50
+"""
+import argparse
+import os
+import time
+
+from app.catalog import CATALOG_FILE, WORKOUTS_DIR, _read_catalog, _read_csvs, _scan
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    catalog_path = os.path.join(WORKOUTS_DIR, CATALOG_FILE)
+    if not os.path.exists(catalog_path):
+        raise SystemExit(f"{catalog_path} not found; run `python workout.py --format catalog` in app/")
+    csv_names = [n for n in _scan(WORKOUTS_DIR) if n.endswith('.csv')]
+
+    csv_time, from_csv = _time(lambda: _read_csvs(WORKOUTS_DIR, csv_names), args.repeat)
+    cat_time, from_catalog = _time(lambda: _read_catalog(catalog_path), args.repeat)
+
+    for key, plan in from_catalog.items():
+        assert {d: list(e) for d, e in plan.items()} == {d: list(e) for d, e in from_csv[key].items()}, key
+
+    csv_bytes = sum(os.path.getsize(os.path.join(WORKOUTS_DIR, n)) for n in csv_names)
+    print(f"per-file CSVs : {len(csv_names):3d} files, {csv_bytes / 1024:7.1f} KiB, {csv_time * 1e3:7.2f} ms/load")
+    print(f"catalog.json  : {1:3d} file,  {os.path.getsize(catalog_path) / 1024:7.1f} KiB, {cat_time * 1e3:7.2f} ms/load")
+    print(f"speed-up      : {csv_time / cat_time:.1f}x ({len(from_catalog)} plans match)")
+
+
+if __name__ == '__main__':
+    main()
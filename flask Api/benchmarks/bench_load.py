@@ -0,0 +1,198 @@
+"""Throughput and tail-latency benchmark for the FITGEN API.
+
+Starts ``create_app()`` on a localhost port (or targets ``--url``), drives
+it with synthetic profiles at several concurrency levels and writes the
+results as JSON so runs can be compared between commits. Run from the
+``flask Api`` directory:
+
+    python -m benchmarks.bench_load --concurrency 1 4 16 --requests 2000
+    python -m benchmarks.bench_load --compare benchmarks/results/<old>.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.profiles import LEVELS, synthetic_profile
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def start_local_server():
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def make_bodies(args, offset=0):
+    # A pool of distinct profiles sampled with replacement, so cache behaviour is controllable.
+    # Each offset draws a fresh pool, so one run's bodies are not cache hits for the next.
+    rng = random.Random(args.seed * 1000003 + offset)
+    distinct = [synthetic_profile(rng) for _ in range(args.distinct_profiles or args.requests)]
+    bodies = []
+    for _ in range(args.requests):
+        level = rng.choice(LEVELS)
+        if args.endpoint == 'batch':
+            bodies.append({'inputs': [dict(rng.choice(distinct)) for _ in range(args.batch_size)],
+                           'level': level})
+        else:
+            bodies.append({'input': dict(rng.choice(distinct)), 'level': level})
+    return bodies
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_level(url, bodies, concurrency):
+    def call(body):
+        data = json.dumps(body).encode()
+        req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req) as resp:
+                resp.read()
+                ok = resp.status == 200
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(call, bodies))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(s for s, ok in samples if ok)
+    return {
+        'concurrency': concurrency,
+        'requests': len(bodies),
+        'errors': len(bodies) - len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        # Successful requests only, so a failing server doesn't look fast
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': _ms(percentile(latencies, 50)),
+        'p95_ms': _ms(percentile(latencies, 95)),
+        'p99_ms': _ms(percentile(latencies, 99)),
+    }
+
+
+def cache_stats(base_url):
+    # Server-side prediction cache counters, or None if the server has no /cache/stats
+    try:
+        with urllib.request.urlopen(base_url.rstrip('/') + '/cache/stats') as resp:
+            return json.load(resp)
+    except Exception:
+        return None
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1e3, 2)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current, baseline):
+    old = {r['concurrency']: r for r in baseline['results']}
+    print(f"\nvs {baseline.get('commit', '?')}:")
+    for r in current['results']:
+        b = old.get(r['concurrency'])
+        if not b:
+            continue
+        deltas = []
+        for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            if r[key] is not None and b.get(key):
+                deltas.append(f"{key} {100.0 * (r[key] - b[key]) / b[key]:+.1f}%")
+        print(f"  c={r['concurrency']:<4} " + ', '.join(deltas))
+
+
+def run(args, base_url):
+    url = base_url.rstrip('/') + ('/predict/batch' if args.endpoint == 'batch' else '/predict')
+
+    # Warm-up and every concurrency level get their own bodies, so no level
+    # replays profiles an earlier one already put in the prediction cache
+    run_level(url, make_bodies(args)[:args.warmup], 1)
+    cache = cache_stats(base_url)
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'endpoint': args.endpoint,
+        'batch_size': args.batch_size if args.endpoint == 'batch' else 1,
+        'distinct_profiles': args.distinct_profiles or args.requests,
+        'prediction_cache_size': cache['maxsize'] if cache else None,
+        'results': [],
+    }
+    for n, concurrency in enumerate(args.concurrency, start=1):
+        before = cache_stats(base_url)
+        result = run_level(url, make_bodies(args, offset=n), concurrency)
+        after = cache_stats(base_url)
+        if before and after:
+            result['cache_hits'] = after['hits'] - before['hits']
+            result['cache_misses'] = after['misses'] - before['misses']
+        report['results'].append(result)
+        print(f"c={concurrency:<4} {result['rps']:>8.1f} req/s  p50 {result['p50_ms']} ms  "
+              f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  errors {result['errors']}"
+              + (f"  cache hits {result['cache_hits']}" if 'cache_hits' in result else ''))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='base URL of a running server; default starts one in-process')
+    parser.add_argument('--endpoint', choices=['predict', 'batch'], default='predict')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--requests', type=int, default=2000, help='requests per concurrency level')
+    parser.add_argument('--distinct-profiles', type=int, default=0,
+                        help='size of the profile pool (default: one per request)')
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/load-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to diff against')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = start_local_server()
+    try:
+        run(args, base_url)
+    finally:
+        # Also when a level fails, so the in-process server never outlives the run
+        if server:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Import time and resident memory of app.model for each TFLite backend.
+
+Each backend is measured in a fresh interpreter process. Run from the
+``flask Api`` directory:
+
+    python -m benchmarks.bench_startup
+"""
+import json
+import os
+import subprocess
+import sys
+
+from app.backend import _BACKENDS
+
+_CHILD = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+import app.model as m
+m.predict({'age': 30.0, 'height': 1.75, 'weight': 70.0, 'weight_loss': 1.0})
+elapsed = time.perf_counter() - start
+rss_kb = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({
+    'backend': m.BACKEND_NAME,
+    'import_and_first_predict_s': round(elapsed, 3),
+    'rss_mb': round(rss_kb / 1024, 1),
+    'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    'heavy_modules': sorted(x for x in ('tensorflow', 'sklearn', 'pandas') if x in sys.modules),
+}))
+'''
+
+
+def measure(backend):
+    env = dict(os.environ, FITGEN_TFLITE_BACKEND=backend, FITGEN_INTERPRETER_POOL_SIZE='1')
+    proc = subprocess.run([sys.executable, '-c', _CHILD], env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'backend': backend, 'error': proc.stderr.strip().splitlines()[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    for backend in _BACKENDS:
+        print(json.dumps(measure(backend)))
+
+
+if __name__ == '__main__':
+    main()
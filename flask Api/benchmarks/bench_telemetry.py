@@ -0,0 +1,54 @@
+"""Per-prediction cost of PredictionTelemetry.observe() on the hot path.
+
+Times single-row and batched updates from one thread and from several threads
+sharing the aggregates, and checks that no update is lost. Run from the
+``flask Api`` directory:
+
+    python -m benchmarks.bench_telemetry --rows 20000 --threads 8
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.model import get_dynamic_thresholds, labels
+from app.telemetry import PredictionTelemetry
+
+
+def run(telemetry, probs, thresholds, batch_size):
+    for i in range(0, len(probs), batch_size):
+        telemetry.observe(probs[i:i + batch_size], thresholds[i:i + batch_size])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    probs = np.random.default_rng(0).random((args.rows, len(labels)), dtype=np.float32)
+    thresholds = get_dynamic_thresholds(probs)
+
+    for batch_size in (1, 64):
+        telemetry = PredictionTelemetry(labels, snapshot_path='')
+        start = time.perf_counter()
+        run(telemetry, probs, thresholds, batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"1 thread, batch {batch_size:3d}: {elapsed / args.rows * 1e6:7.2f} us per prediction")
+
+    telemetry = PredictionTelemetry(labels, snapshot_path='')
+    parts = np.array_split(np.arange(args.rows), args.threads)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as executor:
+        list(executor.map(lambda idx: run(telemetry, probs[idx], thresholds[idx], 1), parts))
+    elapsed = time.perf_counter() - start
+    snapshot = telemetry.snapshot()
+    assert snapshot['predictions'] == args.rows, snapshot['predictions']
+    assert sum(snapshot['threshold_histogram']) == args.rows
+    print(f"{args.threads} threads, batch   1: {elapsed / args.rows * 1e6:7.2f} us per prediction, "
+          f"{len(telemetry._shards)} shards, no updates lost")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Parity and speed of vectorized threshold/label decoding against the per-row loop.
+
+Run from the ``flask Api`` directory:
+
+    python -m benchmarks.bench_thresholds --rows 10000
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.preprocessing import MultiLabelBinarizer
+
+from app.model import decode_predictions, get_dynamic_threshold, labels
+
+
+def loop_decode(prob_matrix):
+    # The per-row path: Python gap loop + MultiLabelBinarizer.inverse_transform
+    mlb = MultiLabelBinarizer()
+    mlb.fit([labels])
+    out = []
+    for probs in prob_matrix:
+        threshold = get_dynamic_threshold(probs)
+        binarized = (probs >= threshold).astype(int)
+        predicted = mlb.inverse_transform(binarized.reshape(1, -1))
+        out.append({
+            "probabilities": {labels[i]: float(probs[i]) for i in range(len(labels))},
+            "predicted_types": list(predicted[0]),
+            "threshold": float(threshold)
+        })
+    return out
+
+
+def sample_matrix(rows, rng):
+    n = len(labels)
+    probs = rng.random((rows, n), dtype=np.float32)
+    # Edge cases: all below 0.1, all equal, ties on the largest gap, exact zeros
+    probs[0::7] *= np.float32(0.09)
+    probs[1::7] = np.float32(0.5)
+    probs[2::7] = np.round(probs[2::7], 1)
+    probs[3::7, : n // 2] = 0.0
+    return probs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    probs = sample_matrix(args.rows, np.random.default_rng(0))
+
+    start = time.perf_counter()
+    expected = loop_decode(probs)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    got = decode_predictions(probs)
+    vector_time = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(expected, got) if a != b)
+    print(f"{args.rows} rows x {len(labels)} labels")
+    print(f"python loop : {loop_time * 1e3:8.1f} ms")
+    print(f"vectorized  : {vector_time * 1e3:8.1f} ms ({loop_time / vector_time:.1f}x)")
+    print("parity: OK" if not mismatches else f"parity: {mismatches} rows differ")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,71 @@
+"""Serialization cost and payload size: JSON vs MessagePack vs raw float32 rows.
+
+Times the full encode + decode round trip of a /predict/batch request and its
+response (probabilities and thresholds only, the part that dominates at volume).
+Run from the ``flask Api`` directory:
+
+    python -m benchmarks.bench_wire --rows 256 --repeat 200
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app import wire
+from app.model import FEATURE_ORDER, build_features, decode_predictions, labels
+from benchmarks.profiles import synthetic_profiles
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=256)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    profiles = synthetic_profiles(args.rows)
+    arr = np.array([build_features(dict(p)) for p in profiles], dtype=np.float32)
+    probs = np.random.default_rng(0).random((args.rows, len(labels)), dtype=np.float32)
+    results = decode_predictions(probs)
+    thresholds = np.array([r['threshold'] for r in results])
+    request_doc = {'inputs': profiles, 'level': 'Easy'}
+    response_doc = {'results': [{k: r[k] for k in ('probabilities', 'predicted_types', 'threshold')}
+                                for r in results]}
+
+    formats = {
+        'json': (
+            lambda: json.loads(json.dumps(request_doc)),
+            lambda: json.loads(json.dumps(response_doc)),
+            len(json.dumps(request_doc)), len(json.dumps(response_doc)),
+        ),
+        'f32': (
+            lambda: wire.decode_rows(arr.astype('<f4').tobytes(), len(FEATURE_ORDER)),
+            lambda: np.frombuffer(wire.encode_rows(probs, thresholds), dtype='<f4'),
+            arr.nbytes, len(wire.encode_rows(probs, thresholds)),
+        ),
+    }
+    if wire.msgpack is not None:
+        formats['msgpack'] = (
+            lambda: wire.unpack(wire.pack(request_doc)),
+            lambda: wire.unpack(wire.pack(response_doc)),
+            len(wire.pack(request_doc)), len(wire.pack(response_doc)),
+        )
+    else:
+        print("msgpack not installed; skipping MessagePack\n")
+
+    print(f"{args.rows} profiles per request")
+    print(f"{'format':8s} {'request us':>11s} {'response us':>12s} {'request B':>10s} {'response B':>11s}")
+    for name, (req_fn, resp_fn, req_size, resp_size) in formats.items():
+        print(f"{name:8s} {_time(req_fn, args.repeat) * 1e6:11.1f} {_time(resp_fn, args.repeat) * 1e6:12.1f} "
+              f"{req_size:10d} {resp_size:11d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Per-request cost of resolving workout plans: per-file pandas reads vs the in-memory catalog.
+
+Run from the ``flask Api`` directory:
+
+    python -m benchmarks.bench_workout_catalog --iterations 500
+"""
+import argparse
+import os
+import random
+import time
+
+import pandas as pd
+
+from app.catalog import WORKOUTS_DIR
+from app.model import get_workout_plans, labels
+from benchmarks.profiles import LEVELS
+
+
+def legacy_get_workout_plans(predicted_types, level):
+    # The previous implementation: one exists() + read_csv + groupby per type
+    plans = {}
+    for fitness_type in predicted_types:
+        filename = f"{fitness_type.replace(' ', '_')}_{level}.csv"
+        file_path = os.path.join(WORKOUTS_DIR, filename)
+        if os.path.exists(file_path):
+            df = pd.read_csv(file_path)
+            plans[fitness_type] = df.groupby('Day')['Exercise'].apply(list).to_dict()
+        else:
+            plans[fitness_type] = {"error": "Workout plan not found"}
+    return plans
+
+
+def _time(fn, cases):
+    start = time.perf_counter()
+    for types, level in cases:
+        fn(types, level)
+    return (time.perf_counter() - start) / len(cases)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--types-per-request', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cases = [(rng.sample(labels, args.types_per_request), rng.choice(LEVELS))
+             for _ in range(args.iterations)]
+
+    for types, level in cases[:50]:
+        assert get_workout_plans(types, level) == legacy_get_workout_plans(types, level)
+
+    legacy = _time(legacy_get_workout_plans, cases)
+    cached = _time(get_workout_plans, cases)
+    print(f"{args.types_per_request} plans per request, {args.iterations} requests")
+    print(f"pandas per-file read : {legacy * 1e6:10.1f} us/request")
+    print(f"in-memory catalog    : {cached * 1e6:10.1f} us/request")
+    print(f"speed-up             : {legacy / cached:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
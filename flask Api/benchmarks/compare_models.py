@@ -0,0 +1,92 @@
+"""Accuracy/latency comparison of two fitgen model files, e.g. float32 vs int8.
+
+Scores the same synthetic (or --profiles JSONL) set with both models and
+reports per-label probability deltas, how often the predicted label set
+changes after the dynamic threshold, and single-row and batched latency.
+Run from the ``flask Api`` directory:
+
+    python -m benchmarks.compare_models app/models/fitgen.tflite app/models/fitgen_int8.tflite
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.model import (FEATURE_ORDER, Interpreter, build_features, decode_predictions,
+                       invoke_model, labels)
+from benchmarks.profiles import synthetic_profiles
+
+
+class Runner:
+    def __init__(self, path):
+        self.path = path
+        self.interpreter = Interpreter(model_path=path)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+
+    def __call__(self, arr):
+        return invoke_model(self.interpreter, arr, self.input_detail, self.output_detail)
+
+    def latency(self, arr, batch_size, repeat):
+        # Seconds per row when scoring `arr` in batches of `batch_size`
+        batches = [arr[i:i + batch_size] for i in range(0, len(arr), batch_size)]
+        self(batches[0])
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for batch in batches:
+                self(batch)
+        return (time.perf_counter() - start) / (repeat * len(arr))
+
+
+def load_profiles(path, n, seed):
+    if not path:
+        return synthetic_profiles(n, seed=seed)
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [r.get('input', r) for r in records]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('reference', help='baseline model, e.g. app/models/fitgen.tflite')
+    parser.add_argument('candidate', help='quantized model to compare')
+    parser.add_argument('--profiles', help='held-out profiles as JSONL (default: synthetic)')
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.profiles, args.rows, args.seed)
+    arr = np.array([build_features(p) for p in profiles], dtype=np.float32)
+    assert arr.shape[1] == len(FEATURE_ORDER)
+
+    ref, cand = Runner(args.reference), Runner(args.candidate)
+    ref_probs, cand_probs = ref(arr), cand(arr)
+    delta = np.abs(cand_probs - ref_probs)
+
+    ref_types = [set(r['predicted_types']) for r in decode_predictions(ref_probs)]
+    cand_types = [set(r['predicted_types']) for r in decode_predictions(cand_probs)]
+    changed = sum(1 for a, b in zip(ref_types, cand_types) if a != b)
+    jaccard = np.mean([len(a & b) / len(a | b) if a | b else 1.0 for a, b in zip(ref_types, cand_types)])
+
+    print(f"{len(arr)} profiles; reference {args.reference}, candidate {args.candidate}\n")
+    print(f"{'label':45s} {'mean |d|':>10s} {'p99 |d|':>10s} {'max |d|':>10s}")
+    for i, label in enumerate(labels):
+        col = delta[:, i]
+        print(f"{label:45s} {col.mean():10.5f} {np.percentile(col, 99):10.5f} {col.max():10.5f}")
+    print(f"\npredicted label set changed: {changed}/{len(arr)} ({100.0 * changed / len(arr):.2f}%), "
+          f"mean Jaccard {jaccard:.4f}\n")
+
+    print(f"{'model':10s} {'single-row us/row':>18s} {'batched us/row':>16s}")
+    single_rows = arr[:min(len(arr), 1000)]
+    for name, runner in (('reference', ref), ('candidate', cand)):
+        single = runner.latency(single_rows, 1, args.repeat)
+        batched = runner.latency(arr, args.batch_size, args.repeat)
+        print(f"{name:10s} {single * 1e6:18.2f} {batched * 1e6:16.2f}")
+
+
+if __name__ == '__main__':
+    main()
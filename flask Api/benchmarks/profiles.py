@@ -0,0 +1,36 @@
+import random
+
+GOALS = ['weight_loss', 'muscle_gain', 'maintain_healthy_weight']
+CONDITIONS = [
+    'normal_diabetes', 'high_diabetes', 'liver_disease',
+    'chronic_kidney_disease', 'hypertension'
+]
+LEVELS = ["Easy", "Intermediate", "Advanced"]
+
+def synthetic_profile(rng=random):
+    # One realistic user profile over the 13 model features
+    gender_male = rng.random() < 0.5
+    height = round(rng.gauss(1.76 if gender_male else 1.63, 0.07), 2)
+    bmi = min(max(rng.gauss(25.5, 4.5), 16.0), 45.0)
+    weight = round(bmi * height ** 2, 1)
+    goal = rng.choice(GOALS)
+    profile = {
+        'age': float(rng.randint(16, 80)),
+        'height': height,
+        'weight': weight,
+        'gender_male': 1.0 if gender_male else 0.0,
+    }
+    for g in GOALS:
+        profile[g] = 1.0 if g == goal else 0.0
+    for c in CONDITIONS:
+        profile[c] = 1.0 if rng.random() < 0.1 else 0.0
+    return profile
+
+def synthetic_profiles(n, seed=0):
+    rng = random.Random(seed)
+    return [synthetic_profile(rng) for _ in range(n)]
+
+def synthetic_requests(n, seed=0):
+    # Request bodies for /predict
+    rng = random.Random(seed)
+    return [{'input': synthetic_profile(rng), 'level': rng.choice(LEVELS)} for _ in range(n)]
@@ -0,0 +1,62 @@
+"""Fire concurrent /predict requests and check every response matches its input.
+
+Run from the ``flask Api`` directory:
+
+    FITGEN_INTERPRETER_POOL_SIZE=4 python -m benchmarks.stress_concurrency --requests 2000 --threads 16
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app
+from app import model
+from benchmarks.profiles import synthetic_requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app()
+    bodies = synthetic_requests(args.requests, seed=args.seed)
+
+    # Reference answers, computed one at a time
+    client = app.test_client()
+    expected = [client.post('/predict', json=b).get_json() for b in bodies]
+
+    def call(i):
+        # Flask test clients are not shared between threads
+        with app.test_client() as c:
+            return i, c.post('/predict', json=bodies[i]).get_json()
+
+    # The reference pass filled the prediction cache; without this the concurrent
+    # pass would be all hits and never check out a pooled interpreter
+    model.prediction_cache.clear()
+    misses_before = model.prediction_cache.stats()['misses']
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(call, range(len(bodies))))
+    elapsed = time.perf_counter() - start
+
+    mismatches = [i for i, got in results if got != expected[i]]
+    misses = model.prediction_cache.stats()['misses'] - misses_before
+    print(f"pool size: {model.POOL_SIZE}, threads: {args.threads}")
+    print(f"{len(bodies)} requests in {elapsed:.2f}s ({len(bodies) / elapsed:.0f} req/s), "
+          f"{misses} prediction cache misses")
+    if model.prediction_cache.maxsize > 0 and misses == 0:
+        print("FAILED: every request was a cache hit, so the interpreter pool was not exercised")
+        return 1
+    if mismatches:
+        print(f"FAILED: {len(mismatches)} responses did not match their input, e.g. #{mismatches[0]}")
+        return 1
+    print("OK: every response matched its input")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
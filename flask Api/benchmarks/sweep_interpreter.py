@@ -0,0 +1,121 @@
+"""Sweep TFLite interpreter threads, batch size and delegate on this machine.
+
+Every combination runs one interpreter over synthetic profiles and reports p50/p99
+latency per invoke and rows per second. With ``--write``, the best combination is
+saved to ``app/models/tuning.json`` (or ``FITGEN_TUNING_FILE``), which
+``app/model.py`` reads at startup. Run from the ``flask Api`` directory:
+
+    python -m benchmarks.sweep_interpreter --threads 1 2 4 --batch-sizes 1 16 256
+    python -m benchmarks.sweep_interpreter --delegates xnnpack none /path/to/libdelegate.so --write
+
+``xnnpack`` is the runtime's default CPU delegate and ``none`` disables it. Any
+other value is loaded as an external delegate library.
+"""
+import argparse
+import json
+import os
+import platform
+import time
+
+os.environ.setdefault('FITGEN_INTERPRETER_POOL_SIZE', '1')
+
+import numpy as np  # noqa: E402
+
+from app.backend import TUNING_FILE, interpreter_kwargs  # noqa: E402
+from app.model import (BACKEND_NAME, MODEL_PATH, Interpreter, build_features,  # noqa: E402
+                       invoke_model)
+from benchmarks.profiles import synthetic_profiles  # noqa: E402
+
+
+def settings_for(threads, delegate):
+    return {
+        'threads': threads,
+        'xnnpack': delegate != 'none',
+        'delegate': None if delegate in ('xnnpack', 'none') else delegate,
+        'delegate_options': {},
+    }
+
+
+def measure(content, settings, arr, batch_size, iterations):
+    interp = Interpreter(model_content=content, **interpreter_kwargs(BACKEND_NAME, settings))
+    interp.allocate_tensors()
+    input_detail = interp.get_input_details()[0]
+    output_detail = interp.get_output_details()[0]
+    batches = [arr[i:i + batch_size] for i in range(0, len(arr) - batch_size + 1, batch_size)]
+    invoke_model(interp, batches[0], input_detail, output_detail)
+    timings = []
+    for n in range(iterations):
+        batch = batches[n % len(batches)]
+        start = time.perf_counter()
+        invoke_model(interp, batch, input_detail, output_detail)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings)
+    return {
+        'p50_ms': round(float(np.percentile(timings, 50)) * 1e3, 4),
+        'p99_ms': round(float(np.percentile(timings, 99)) * 1e3, 4),
+        'rows_per_s': round(batch_size * len(timings) / float(timings.sum()), 1),
+    }
+
+
+def best(results, objective, serving_batch):
+    if objective == 'latency':
+        candidates = [r for r in results if r['batch_size'] == serving_batch] or results
+        return min(candidates, key=lambda r: (r['p99_ms'], r['p50_ms']))
+    return max(results, key=lambda r: (r['rows_per_s'], -r['p99_ms']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 64, 256])
+    parser.add_argument('--delegates', nargs='+', default=['xnnpack', 'none'])
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--objective', choices=('latency', 'throughput'), default='latency',
+                        help='latency: lowest p99 at --serving-batch; throughput: most rows/s')
+    parser.add_argument('--serving-batch', type=int, default=1)
+    parser.add_argument('--write', action='store_true', help=f'save the best settings to {TUNING_FILE}')
+    args = parser.parse_args()
+
+    with open(MODEL_PATH, 'rb') as f:
+        content = f.read()
+    rows = max(max(args.batch_sizes) * 4, 1024)
+    arr = np.array([build_features(p) for p in synthetic_profiles(rows)], dtype=np.float32)
+
+    print(f"{BACKEND_NAME} on {os.cpu_count()} CPUs, {MODEL_PATH}")
+    print(f"{'delegate':>10s} {'threads':>7s} {'batch':>6s} {'p50 ms':>9s} {'p99 ms':>9s} {'rows/s':>11s}")
+    results = []
+    for delegate in args.delegates:
+        for threads in args.threads:
+            settings = settings_for(threads, delegate)
+            for batch_size in args.batch_sizes:
+                try:
+                    stats = measure(content, settings, arr, batch_size, args.iterations)
+                except (RuntimeError, ValueError, OSError) as e:
+                    print(f"{delegate:>10s} {threads:7d} {batch_size:6d}  failed: {e}")
+                    continue
+                results.append(dict(settings, batch_size=batch_size, **stats))
+                print(f"{delegate:>10s} {threads:7d} {batch_size:6d} {stats['p50_ms']:9.4f} "
+                      f"{stats['p99_ms']:9.4f} {stats['rows_per_s']:11.1f}")
+    if not results:
+        raise SystemExit("every configuration failed")
+
+    winner = best(results, args.objective, args.serving_batch)
+    print(f"\nbest for {args.objective}: threads={winner['threads']} xnnpack={winner['xnnpack']} "
+          f"delegate={winner['delegate']} batch_size={winner['batch_size']}")
+    if args.write:
+        tuning = {key: winner[key] for key in ('threads', 'xnnpack', 'delegate', 'delegate_options', 'batch_size')}
+        tuning.update({
+            'objective': args.objective,
+            'backend': BACKEND_NAME,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'measured_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'results': results,
+        })
+        with open(TUNING_FILE, 'w', encoding='utf-8') as f:
+            json.dump(tuning, f, indent=2)
+        print(f"wrote {TUNING_FILE}")
+
+
+if __name__ == '__main__':
+    main()
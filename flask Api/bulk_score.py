@@ -0,0 +1,209 @@
+"""Bulk-score user profiles offline.
+
+Streams profiles from a CSV (one column per feature, plus optional ``id`` and
+``level`` columns) or a JSONL file (one profile per line, either a flat feature
+dict or ``{"id": ..., "input": {...}, "level": ...}``) in fixed-size chunks. Each
+chunk is scored with one batched TFLite invoke in a worker process, and the
+results are appended to a JSONL output file in input order. A row that cannot be
+read or scored is written as ``{"id": ..., "error": ...}`` and counted, instead of
+stopping the run. A checkpoint next to
+the output records progress after every chunk, so an interrupted run can
+continue with ``--resume``.
+
+    python bulk_score.py users.csv scored.jsonl --level Intermediate --workers 4
+    python bulk_score.py users.csv scored.jsonl --level Intermediate --workers 4 --resume
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+FEATURES = [
+    'age', 'height', 'weight', 'weight_loss', 'muscle_gain',
+    'maintain_healthy_weight', 'normal_diabetes', 'high_diabetes',
+    'liver_disease', 'chronic_kidney_disease', 'hypertension',
+    'bmi', 'gender_male'
+]
+
+
+def _csv_profile(row):
+    # Empty cells are treated as missing, so BMI is derived and flags default to 0
+    profile = {}
+    for k, v in row.items():
+        if k in FEATURES and v not in (None, ''):
+            try:
+                profile[k] = float(v)
+            except ValueError:
+                raise ValueError(f"{k}: not a number: {v!r}") from None
+    return profile
+
+
+def read_profiles(path):
+    # Yields (id, input dict or None, level or None, error or None) without loading the
+    # whole file. Unreadable rows still yield (with the error), so row counts stay stable
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            for n, row in enumerate(csv.DictReader(f)):
+                row_id, level = row.get('id') or n, row.get('level') or None
+                try:
+                    yield row_id, _csv_profile(row), level, None
+                except ValueError as e:
+                    yield row_id, None, level, str(e)
+    else:
+        with open(path, encoding='utf-8') as f:
+            for n, line in enumerate(f):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield n, None, None, f"invalid JSON: {e}"
+                    continue
+                if not isinstance(record, dict):
+                    yield n, None, None, "expected a JSON object"
+                elif 'input' in record:
+                    profile = record['input']
+                    error = None if isinstance(profile, dict) else "input must be a JSON object"
+                    yield record.get('id', n), profile if error is None else None, record.get('level'), error
+                else:
+                    yield n, record, None, None
+
+
+def _init_worker():
+    # One interpreter per process; profiles are unique, so skip the prediction cache
+    os.environ.setdefault('FITGEN_INTERPRETER_POOL_SIZE', '1')
+    os.environ.setdefault('FITGEN_PREDICTION_CACHE_SIZE', '0')
+    import app.model  # noqa: F401  (loads the model once per worker)
+
+
+def score_chunk(rows, default_level, with_probabilities):
+    from app.model import get_workout_plans, predict_batch
+
+    valid = [i for i, row in enumerate(rows) if row[3] is None]
+    try:
+        scored = predict_batch([rows[i][1] for i in valid])
+        results = dict(zip(valid, scored))
+    except Exception:
+        # One bad profile fails the whole invoke; score the chunk row by row to find it
+        results = {}
+        for i in valid:
+            try:
+                results[i] = predict_batch([rows[i][1]])[0]
+            except Exception as e:
+                results[i] = e
+
+    out = []
+    for i, (row_id, _, level, error) in enumerate(rows):
+        result = results.get(i, error)
+        if not isinstance(result, dict):
+            out.append({'id': row_id, 'error': str(result) or type(result).__name__})
+            continue
+        level = level or default_level
+        record = {
+            'id': row_id,
+            'predicted_types': result['predicted_types'],
+            'threshold': result['threshold'],
+            'level': level,
+            'workout_plans': get_workout_plans(result['predicted_types'], level) if level else {},
+        }
+        if with_probabilities:
+            record['probabilities'] = result['probabilities']
+        out.append(record)
+    return out
+
+
+def _chunks(iterator, size):
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-score user profiles from CSV or JSONL")
+    parser.add_argument('input', help='profiles as .csv or .jsonl')
+    parser.add_argument('output', help='JSONL file to append results to')
+    parser.add_argument('--level', help='workout level for rows without a level column')
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--probabilities', action='store_true', help='include per-label probabilities')
+    parser.add_argument('--resume', action='store_true', help='continue from the checkpoint')
+    parser.add_argument('--checkpoint', help='checkpoint file (default: <output>.ckpt)')
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or args.output + '.ckpt'
+    state = {'input': os.path.abspath(args.input), 'rows_done': 0, 'output_bytes': 0, 'errors': 0}
+    if args.resume:
+        saved = load_checkpoint(checkpoint_path)
+        if saved:
+            if saved.get('input') != state['input']:
+                sys.exit(f"Checkpoint {checkpoint_path} belongs to {saved.get('input')}")
+            state = saved
+    elif os.path.exists(checkpoint_path):
+        sys.exit(f"{checkpoint_path} exists; pass --resume to continue or delete it to start over")
+
+    # Drop anything written after the last checkpoint, then skip the rows it covers
+    mode = 'r+b' if args.resume and os.path.exists(args.output) else 'wb'
+    out = open(args.output, mode)
+    out.truncate(state['output_bytes'])
+    out.seek(state['output_bytes'])
+
+    rows = islice(read_profiles(args.input), state['rows_done'], None)
+    max_in_flight = max(1, args.workers) * 2
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as executor, out:
+        pending = deque()
+        chunks = _chunks(rows, args.chunk_size)
+
+        def drain_one():
+            size, future = pending.popleft()
+            for record in future.result():
+                if 'error' in record:
+                    state['errors'] = state.get('errors', 0) + 1
+                out.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+            out.flush()
+            os.fsync(out.fileno())
+            state['rows_done'] += size
+            state['output_bytes'] = out.tell()
+            save_checkpoint(checkpoint_path, state)
+
+        # At most `max_in_flight` chunks are held in memory at any time
+        for chunk in chunks:
+            pending.append((len(chunk), executor.submit(score_chunk, chunk, args.level, args.probabilities)))
+            if len(pending) >= max_in_flight:
+                drain_one()
+        while pending:
+            drain_one()
+
+    # Finished: a later run starts fresh instead of resuming
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    errors = state.get('errors', 0)
+    print(f"scored {state['rows_done'] - errors} profiles into {args.output}, {errors} rows with errors")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
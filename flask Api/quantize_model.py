@@ -0,0 +1,61 @@
+"""Convert the trained fitgen Keras/SavedModel into quantized TFLite variants.
+
+Writes app/models/fitgen_float16.tflite (float16 weights, float32 I/O) and
+app/models/fitgen_int8.tflite (full integer quantization, calibrated on
+synthetic profiles), which FITGEN_MODEL_VARIANT=float16|int8 selects. Needs
+full TensorFlow.
+
+    python quantize_model.py path/to/saved_model_or_model.keras
+"""
+import argparse
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from app.model import BASE_DIR, MODEL_VARIANTS, build_features
+from benchmarks.profiles import synthetic_profiles
+
+
+def _converter(path):
+    if os.path.isdir(path):
+        return tf.lite.TFLiteConverter.from_saved_model(path)
+    return tf.lite.TFLiteConverter.from_keras_model(tf.keras.models.load_model(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('model', help='SavedModel directory or Keras model file')
+    parser.add_argument('--calibration-rows', type=int, default=2000)
+    parser.add_argument('--output-dir', default=os.path.join(BASE_DIR, 'models'))
+    args = parser.parse_args()
+
+    calibration = np.array([build_features(p) for p in synthetic_profiles(args.calibration_rows, seed=1)],
+                           dtype=np.float32)
+
+    def representative_dataset():
+        for row in calibration:
+            yield [row.reshape(1, -1)]
+
+    converter = _converter(args.model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    outputs = {'float16': converter.convert()}
+
+    converter = _converter(args.model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    outputs['int8'] = converter.convert()
+
+    for variant, content in outputs.items():
+        path = os.path.join(args.output_dir, MODEL_VARIANTS[variant])
+        with open(path, 'wb') as f:
+            f.write(content)
+        print(f"wrote {path} ({len(content) / 1024:.1f} KiB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""Pre-fork production server for the FITGEN API.
+
+The master process loads the model bytes, labels and workout catalog once,
+then forks workers that share those pages copy-on-write. Each worker builds
+its own interpreter pool, runs a warm-up inference and only then starts
+accepting connections on the shared listening socket, served by waitress (idle
+connection timeouts, keep-alive, a bounded thread pool). A worker that exits
+soon after starting is restarted with exponential backoff; after
+``--max-crashes`` quick exits in a row the server shuts down instead of
+fork-looping on a broken model or tuning file.
+
+    python serve.py --host 0.0.0.0 --port 5000 --workers 4
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from waitress import create_server
+
+from app import create_app, start_watchers
+from app import model
+from app.catalog import workout_catalog
+
+log = logging.getLogger("fitgen.serve")
+
+# A worker that exits sooner than this after being forked counts as a crash
+MIN_UPTIME = 30.0
+RESTART_BACKOFF = 0.5
+RESTART_BACKOFF_MAX = 60.0
+
+
+def memory_usage():
+    # Resident, shared and private memory of this process in MB (Linux only)
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    usage[parts[0][:-1]] = int(parts[1]) / 1024.0
+    except OSError:
+        return {}
+    return {
+        "rss": usage.get("Rss", 0.0),
+        "pss": usage.get("Pss", 0.0),
+        "shared": usage.get("Shared_Clean", 0.0) + usage.get("Shared_Dirty", 0.0),
+        "private": usage.get("Private_Clean", 0.0) + usage.get("Private_Dirty", 0.0),
+    }
+
+
+def run_worker(app, sock, args, index):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # Each worker slot keeps its own telemetry snapshot, restored when the slot restarts
+    if model.telemetry.snapshot_path:
+        model.telemetry.snapshot_path = f"{args.telemetry_file}.{index}"
+        model.telemetry.reset(model.telemetry.labels)
+        model.telemetry.restore()
+
+    model.init_interpreter_pool(args.pool_size)
+    start = time.perf_counter()
+    model.warm_up()
+    first_ms = (time.perf_counter() - start) * 1e3
+    start = time.perf_counter()
+    model.warm_up()
+    warm_ms = (time.perf_counter() - start) * 1e3
+    start_watchers()
+
+    mem = memory_usage()
+    log.info(
+        "worker %d ready: warm-up %.1f ms (steady %.1f ms), rss %.1f MB, "
+        "shared with master %.1f MB, private %.1f MB",
+        os.getpid(), first_ms, warm_ms, mem.get("rss", 0.0),
+        mem.get("shared", 0.0), mem.get("private", 0.0),
+    )
+
+    server = create_server(app, sockets=[sock], threads=args.threads,
+                           channel_timeout=args.timeout, ident="fitgen")
+    server.run()
+
+
+def spawn(app, sock, args, index):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(app, sock, args, index)
+        except Exception:
+            log.exception("worker %d crashed", os.getpid())
+        finally:
+            os._exit(1)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork server for the FITGEN API")
+    parser.add_argument("--host", default=os.getenv("FITGEN_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("FITGEN_PORT", "5000")))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("FITGEN_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--pool-size", type=int, default=0,
+                        help="interpreters per worker (default: CPU count / workers)")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("FITGEN_THREADS", "8")),
+                        help="request threads per worker")
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("FITGEN_TIMEOUT", "30")),
+                        help="seconds before an idle or stalled connection is closed")
+    parser.add_argument("--max-crashes", type=int, default=10,
+                        help="quick worker exits in a row before the server gives up")
+    args = parser.parse_args()
+    args.pool_size = args.pool_size or max(1, (os.cpu_count() or 1) // args.workers)
+    args.telemetry_file = model.telemetry.snapshot_path
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    # Everything read-only is loaded here, before fork(): labels, model bytes and the
+    # workout catalog come in with `app`. The master's own interpreters are dropped.
+    app = create_app(watch=False)
+    model.close_interpreter_pool()
+    mem = memory_usage()
+    log.info("master %d loaded model and %d workout plans, rss %.1f MB",
+             os.getpid(), len(workout_catalog), mem.get("rss", 0.0))
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    # Move surviving objects out of the GC's generations so collections in the
+    # workers don't write to (and un-share) the master's pages
+    gc.collect()
+    gc.freeze()
+
+    workers = {spawn(app, sock, args, index): index for index in range(args.workers)}
+    started = {pid: time.monotonic() for pid in workers}
+    crashes = [0] * args.workers  # quick exits in a row, per worker slot
+    log.info("listening on %s:%d with %d workers", args.host, args.port, len(workers))
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    exit_code = 0
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = workers.pop(pid, None)
+        uptime = time.monotonic() - started.pop(pid, 0.0)
+        if stopping or index is None:
+            continue
+        crashes[index] = crashes[index] + 1 if uptime < MIN_UPTIME else 0
+        if crashes[index] >= args.max_crashes:
+            log.error("worker slot %d exited %d times in a row within %.0fs of starting; shutting down",
+                      index, crashes[index], MIN_UPTIME)
+            exit_code = 1
+            stop(None, None)
+            continue
+        delay = min(RESTART_BACKOFF * 2 ** (crashes[index] - 1), RESTART_BACKOFF_MAX) if crashes[index] else 0.0
+        log.warning("worker %d exited with status %d after %.1fs; restarting in %.1fs",
+                    pid, status, uptime, delay)
+        deadline = time.monotonic() + delay
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(min(0.5, deadline - time.monotonic()))
+        if not stopping:
+            new_pid = spawn(app, sock, args, index)
+            workers[new_pid] = index
+            started[new_pid] = time.monotonic()
+    sock.close()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())